@@ -1,44 +1,358 @@
 import argparse
+import asyncio
+import hashlib
 import json
 import os
+import re
+import sys
 import time
 from pathlib import Path
-from playwright.sync_api import sync_playwright, ElementHandle
+from playwright.async_api import async_playwright, ElementHandle, TimeoutError as PlaywrightTimeout
 
-def extract_ads_with_playwright(url: str, output_file: str):
+try:
+    import orjson
+except ImportError:  # orjson is an optional speed-up, fall back to stdlib json
+    orjson = None
+
+# Cheap selector covering the same candidates the detection script looks at,
+# used only to tell when ads have stopped appearing on the page
+AD_CANDIDATE_SELECTOR = (
+    'ins.adsbygoogle, iframe, div[id*="ad"], div[class*="ad-"], div[class*="banner"], '
+    'div[class*="advert"], div[data-ad-type]'
+)
+
+# Ad detection script, registered as an init script on every browser context so V8
+# compiles it once per context; detection itself is then just a call to window.__extractAds()
+AD_DETECTION_SCRIPT = """
+    window.__extractAds = function() {
+        const adData = [];
+        const host = window.location.hostname;
+        // Element behind each adData entry, handed back to Playwright as handles
+        const adElements = [];
+
+        // Selectors are requested more than once per element, so memoize them
+        const selectorCache = new WeakMap();
+
+        function getElementSelector(el) {
+            if (!el || typeof el.tagName === 'undefined') {
+                return null;
+            }
+            if (selectorCache.has(el)) return selectorCache.get(el);
+            let selector;
+            if (el.id) {
+                selector = '#' + CSS.escape(el.id);
+            } else {
+                selector = el.tagName.toLowerCase();
+                if (el.classList.length > 0) {
+                    selector += '.' + Array.from(el.classList, cls => CSS.escape(cls)).join('.');
+                }
+            }
+            selectorCache.set(el, selector);
+            return selector;
+        }
+
+        // Classifies an ad iframe from its src with one regex test and a single host check;
+        // returns null for iframes that are not ads (reCAPTCHA)
+        const googleAdSrcPattern = /google|doubleclick/;
+
+        function classifyIframe(src) {
+            if (!src) return 'Unknown External Ad';
+            if (src.includes('recaptcha')) return null;
+            if (googleAdSrcPattern.test(src)) return 'Google Ad (iframe)';
+            return src.includes(host) ? 'Internal Ad (iframe)' : 'External Ad (iframe)';
+        }
+
+        // First link href and image src under root, found in one subtree walk rather than
+        // separate querySelector('a') and querySelector('img') traversals
+        function getLinkAndImage(root) {
+            let link;
+            let imageSrc;
+            for (const node of root.querySelectorAll('a, img')) {
+                if (link === undefined && node.tagName === 'A') {
+                    link = node.href;
+                } else if (imageSrc === undefined && node.tagName === 'IMG') {
+                    imageSrc = node.src;
+                }
+                if (link !== undefined && imageSrc !== undefined) break;
+            }
+            return { link, imageSrc };
+        }
+
+        // Selectors of everything recorded so far, plus its boxes bucketed into a 5px grid
+        // by position. A box within 5px of another on every side lies in the same or a
+        // neighbouring cell, so the generic heuristic's "< 5px apart" duplicate check only
+        // compares against the boxes in the 3x3 cells around it instead of all of adData
+        const seenSelectors = new Set();
+        const seenBoxes = new Map();
+        const BOX_CELL = 5;
+
+        function boxCell(x, y) {
+            return Math.floor(x / BOX_CELL) + ',' + Math.floor(y / BOX_CELL);
+        }
+
+        function hasNearbyBox(rect) {
+            const cx = Math.floor(rect.x / BOX_CELL);
+            const cy = Math.floor(rect.y / BOX_CELL);
+            for (let dx = -1; dx <= 1; dx++) {
+                for (let dy = -1; dy <= 1; dy++) {
+                    const boxes = seenBoxes.get((cx + dx) + ',' + (cy + dy));
+                    if (boxes && boxes.some(box =>
+                            Math.abs(box.x - rect.x) < 5 && Math.abs(box.y - rect.y) < 5 &&
+                            Math.abs(box.width - rect.width) < 5 && Math.abs(box.height - rect.height) < 5)) {
+                        return true;
+                    }
+                }
+            }
+            return false;
+        }
+
+        function addAd(ad, rect, el) {
+            seenSelectors.add(ad.selector);
+            const cell = boxCell(rect.x, rect.y);
+            if (!seenBoxes.has(cell)) seenBoxes.set(cell, []);
+            seenBoxes.get(cell).push(rect);
+            adData.push(ad);
+            adElements.push(el);
+        }
+
+        // Collect every candidate up front, tagged with the heuristic that matched it
+        // Generic ad divs are found with one walk over the divs and a precompiled class
+        // pattern, instead of substring attribute selectors (the engine's slow path).
+        // Matches ids containing "ad", classes containing "ad-", "banner", "advert" or
+        // GFG's "ad_content_wrapper" ("gfg-ad-cont" is covered by "ad-"), and data-ad-type
+        const genericAdClassPattern = /ad-|banner|advert|ad_content_wrapper/;
+        function isGenericAdDiv(el) {
+            return el.id.includes('ad') ||
+                genericAdClassPattern.test(el.className) ||
+                el.hasAttribute('data-ad-type');
+        }
+        const candidates = [
+            // Heuristic 1: Look for Google AdSense containers
+            ...Array.from(document.querySelectorAll('ins.adsbygoogle'), el => [el, 'adsense']),
+            // Heuristic 2: Look for common ad iframes
+            ...Array.from(document.querySelectorAll('iframe'), el => [el, 'iframe']),
+            // Heuristic 3: Look for divs with common ad classes/ids (refine as needed)
+            ...Array.from(document.getElementsByTagName('div')).filter(isGenericAdDiv).map(el => [el, 'generic'])
+        ];
+
+        // Read all rects in one batch before walking any other DOM properties,
+        // so layout is computed once rather than forced again for every element
+        const rects = candidates.map(([el]) => el.getBoundingClientRect());
+
+        candidates.forEach(([el, heuristic], i) => {
+            const rect = rects[i];
+            if (rect.width <= 0 || rect.height <= 0) { // Only consider visible ads
+                return;
+            }
+
+            if (heuristic === 'adsense') {
+                const { link, imageSrc } = getLinkAndImage(el);
+                addAd({
+                    type: 'Google AdSense',
+                    selector: getElementSelector(el),
+                    width: rect.width,
+                    height: rect.height,
+                    x: rect.x,
+                    y: rect.y,
+                    link: link || null,
+                    imageSrc: imageSrc || null
+                }, rect, el);
+            } else if (heuristic === 'iframe') {
+                const iframeSrc = el.src || null;
+                const adType = classifyIframe(iframeSrc);
+                if (adType === null) { // Exclude reCAPTCHA
+                    return;
+                }
+
+                let link = null;
+                let imageSrc = null;
+                try {
+                    if (el.contentWindow && el.contentWindow.document) {
+                        ({ link, imageSrc } = getLinkAndImage(el.contentWindow.document));
+                    }
+                } catch (e) {
+                    // Cross-origin access blocked, link/imageSrc remain null
+                }
+
+                addAd({
+                    type: adType,
+                    selector: getElementSelector(el),
+                    width: rect.width,
+                    height: rect.height,
+                    x: rect.x,
+                    y: rect.y,
+                    iframeSrc: iframeSrc,
+                    link: link,
+                    imageSrc: imageSrc
+                }, rect, el);
+            } else {
+                const currentSelector = getElementSelector(el);
+                if (seenSelectors.has(currentSelector) || hasNearbyBox(rect)) {
+                    return;
+                }
+
+                let adType = 'Generic Ad';
+                const { link, imageSrc } = getLinkAndImage(el);
+                if (link && link.includes(host)) {
+                    adType = 'Internal Ad';
+                } else if (link) {
+                    adType = 'External Ad';
+                }
+
+                addAd({
+                    type: adType,
+                    selector: currentSelector,
+                    width: rect.width,
+                    height: rect.height,
+                    x: rect.x,
+                    y: rect.y,
+                    link: link,
+                    imageSrc: imageSrc || null
+                }, rect, el);
+            }
+        });
+
+        return { json: JSON.stringify(adData), elements: adElements };
+    };
+"""
+
+# Analytics, consent-manager and chat-widget traffic that plays no part in ad detection.
+# Ad networks (doubleclick, googlesyndication, ...) are deliberately not listed
+NOISE_URL_PATTERN = re.compile(r"(google-analytics|segment\.io|hotjar|intercom|cookiebot|onetrust)")
+
+async def _abort_request(route):
+    """Route handler for NOISE_URL_PATTERN: aborts the request."""
+    await route.abort()
+
+# Translation tables for turning URL names and ad types into file names in a single pass
+URL_PATH_FILENAME_TABLE = str.maketrans({'.': '_', '/': '_', ':': None})
+AD_TYPE_FILENAME_TABLE = str.maketrans({' ': '_', '(': None, ')': None, '/': '_', ':': None})
+
+# Per scroll step: always wait SCROLL_SETTLE_FLOOR_MS, then up to SCROLL_SETTLE_CAP_MS in total
+# for the page to grow (SCROLL_GROWTH_JS). Only scrollHeight is polled, since that is cheap;
+# ad candidates are counted once, after scrolling, by wait_for_ads_to_settle
+SCROLL_SETTLE_FLOOR_MS = 250
+SCROLL_SETTLE_CAP_MS = 1000
+SCROLL_GROWTH_JS = """
+(height) => document.body.scrollHeight > height
+"""
+
+# Upper bound on ad screenshots in flight at once
+MAX_CONCURRENT_SCREENSHOTS = 8
+
+# Playwright driver and browser shared by every URL handled in this process,
+# launched on first use so batch runs only pay Chromium's startup cost once
+_playwright = None
+_browser = None
+
+async def _ensure_browser():
+    """Launches the shared browser if needed and returns the (playwright, browser) pair."""
+    global _playwright, _browser
+    if _browser is None:
+        _playwright = await async_playwright().start()
+        # Launch browser - consider `chromium.launch(headless=False)` for debugging.
+        # Images stay enabled for screenshots, but unrelated background work is switched off
+        _browser = await _playwright.chromium.launch(
+            headless=True,
+            args=["--disable-background-networking", "--disable-background-timer-throttling"],
+        )
+    return _playwright, _browser
+
+async def close_browser():
+    """Shuts down the shared browser, if one was launched."""
+    global _playwright, _browser
+    if _browser is not None:
+        await _browser.close()
+        await _playwright.stop()
+        _playwright = None
+        _browser = None
+
+def sanitize_url_path(url):
+    """Turns the last path segment of a URL into a name that is safe for files and folders."""
+    return Path(url).name.translate(URL_PATH_FILENAME_TABLE)
+
+async def wait_for_ads_to_settle(page, interval_ms=500, budget_ms=5000):
+    """
+    Polls the number of ad candidates on the page and returns once the count
+    is unchanged across two consecutive checks, or when the budget runs out.
+    Returns the time waited in milliseconds.
+    """
+    last_count = None
+    waited = 0
+    while waited < budget_ms:
+        await page.wait_for_timeout(interval_ms)
+        waited += interval_ms
+        count = await page.evaluate("(selector) => document.querySelectorAll(selector).length", AD_CANDIDATE_SELECTOR)
+        if count == last_count:
+            break
+        last_count = count
+    return waited
+
+def save_results(output_file, url, ad_results):
+    """
+    Streams the results JSON to disk one ad at a time, so only a single ad is ever
+    held in serialized form instead of a copy of the whole document. The layout
+    matches a pretty-printed dump of {url, total_ads_identified, ad_data}.
+    """
+    if orjson:
+        indent = b"  "
+        def dump(value):
+            return orjson.dumps(value, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS)
+    else:
+        indent = b"    "
+        def dump(value):
+            return json.dumps(value, indent=4, ensure_ascii=False).encode('utf-8')
+    item_indent = b"\n" + indent * 2
+
+    with open(output_file, 'wb') as f:
+        f.write(b"{\n" + indent + b'"url": ' + dump(url) + b",\n")
+        f.write(indent + b'"total_ads_identified": ' + dump(len(ad_results)) + b",\n")
+        if not ad_results:
+            f.write(indent + b'"ad_data": []\n}')
+            return
+        f.write(indent + b'"ad_data": [')
+        for i, ad_info in enumerate(ad_results):
+            separator = b"," if i else b""
+            f.write(separator + item_indent + dump(ad_info).replace(b"\n", item_indent))
+        f.write(b"\n" + indent + b"]\n}")
+
+async def extract_ads_with_playwright(url: str, output_file: str, browser=None):
     """
     Navigates to a URL, simulates scrolling to load dynamic content,
     extracts information about ads, takes screenshots of ads,
     and saves the data to a JSON file.
+    Runs in a fresh context on `browser`, or on the shared browser if none is given.
     """
-    
-    ad_results = []
-    
+
     # Create a directory for ad screenshots
     # Use a sanitised version of the URL path for the directory name
-    sanitized_url_path = Path(url).name.replace('.', '_').replace('/', '_').replace(':', '')
-    screenshots_dir = Path("ad_screenshots") / sanitized_url_path
+    screenshots_dir = Path("ad_screenshots") / sanitize_url_path(url)
     screenshots_dir.mkdir(parents=True, exist_ok=True)
 
-    with sync_playwright() as p:
-        # Launch browser - consider `chromium.launch(headless=False)` for debugging
-        browser = p.chromium.launch(headless=True)
-        page = browser.new_page()
+    if browser is None:
+        _, browser = await _ensure_browser()
+
+    # A new context per URL keeps pages isolated at a fraction of the cost of a new browser
+    context = await browser.new_context()
+    await context.add_init_script(AD_DETECTION_SCRIPT)
+    # Only URLs matching the pattern are intercepted; everything else bypasses the
+    # Python handler and keeps the HTTP cache
+    await context.route(NOISE_URL_PATTERN, _abort_request)
+    try:
+        page = await context.new_page()
 
         print(f"Navigating to: {url}")
         try:
             # Navigate without waiting for networkidle, just wait for 'load' (initial HTML and resources)
-            page.goto(url, wait_until="load", timeout=60000) # Increased timeout for initial load
+            await page.goto(url, wait_until="load", timeout=60000) # Increased timeout for initial load
         except Exception as e:
             print(f"Error navigating to {url}: {e}")
-            browser.close()
             return
 
         print("Page loaded. Simulating scroll to load dynamic content...")
 
         # --- Simulate Scrolling to Load All Content ---
-        scroll_height = page.evaluate("document.body.scrollHeight")
-        viewport_height = page.evaluate("window.innerHeight")
+        scroll_height, viewport_height = await page.evaluate("() => [document.body.scrollHeight, window.innerHeight]")
         current_scroll_pos = 0
         scroll_step = viewport_height * 0.8 # Scroll 80% of viewport height each step
         
@@ -46,21 +360,35 @@ def extract_ads_with_playwright(url: str, output_file: str):
         # Adjust max_scrolls if pages are very long or ads load very far down
         max_scrolls = 10 
         scroll_count = 0
+        previous_scroll_height = None
 
-        while current_scroll_pos < scroll_height and scroll_count < max_scrolls:
-            # Scroll down
-            page.evaluate(f"window.scrollTo(0, {current_scroll_pos + scroll_step})")
+        while scroll_count < max_scrolls:
+            # Scroll down and read the page height in the same round-trip. The height
+            # picks up whatever content the previous step's wait let load
             current_scroll_pos += scroll_step
+            new_scroll_height = await page.evaluate(
+                "(y) => { window.scrollTo(0, y); return document.body.scrollHeight; }", current_scroll_pos
+            )
             
-            # Wait briefly for new content to load and render
-            page.wait_for_timeout(1000) # Wait for 1 second after each scroll
-
-            # Update scroll_height in case new content has made the page longer
-            new_scroll_height = page.evaluate("document.body.scrollHeight")
-            if new_scroll_height == scroll_height:
-                # If page height hasn't changed after scrolling, might be at the end
-                if current_scroll_pos >= new_scroll_height:
-                    break
+            # Give lazy content a short head start, then move on as soon as the page grows.
+            # Never waits longer than the old fixed 1 second step
+            await page.wait_for_timeout(SCROLL_SETTLE_FLOOR_MS)
+            try:
+                await page.wait_for_function(
+                    SCROLL_GROWTH_JS,
+                    arg=new_scroll_height,
+                    polling=100,
+                    timeout=SCROLL_SETTLE_CAP_MS - SCROLL_SETTLE_FLOOR_MS,
+                )
+            except PlaywrightTimeout:
+                pass
+
+            # Update scroll_height in case new content has made the page longer.
+            # Heights trail the scroll by one step, so only treat the page as finished once
+            # we are past the bottom and the height has held for two steps in a row
+            if current_scroll_pos >= new_scroll_height and new_scroll_height == scroll_height == previous_scroll_height:
+                break
+            previous_scroll_height = scroll_height
             scroll_height = new_scroll_height
             scroll_count += 1
             print(f"Scrolled {scroll_count} times. Current position: {int(current_scroll_pos)} / {int(scroll_height)}")
@@ -68,133 +396,26 @@ def extract_ads_with_playwright(url: str, output_file: str):
         print("Scrolling simulation complete.")
         # --- End Scrolling Simulation ---
 
-        # Wait a fixed, generous time for all ads/scripts to execute after scrolling
-        # This is crucial for ads that load after all visual content is in place.
-        print("Waiting for final script execution and ad rendering (5 seconds)...")
-        page.wait_for_timeout(5000) # Wait 5 seconds after scrolling, regardless of network status
+        # Wait for ads/scripts that load after all visual content is in place, but only
+        # until the set of ad candidates stops changing (5 second ceiling)
+        print("Waiting for final script execution and ad rendering...")
+        waited_ms = await wait_for_ads_to_settle(page)
+        print(f"Ad candidates settled after {waited_ms / 1000:.1f} seconds.")
 
         print("Executing JavaScript for ad detection...")
 
-        # JavaScript code to run in the browser context
-        js_ad_detection_script = """
-        (function() {
-            const adData = [];
-
-            function getElementSelector(el) {
-                if (!el || typeof el.tagName === 'undefined') {
-                    return null;
-                }
-                if (el.id) return '#' + CSS.escape(el.id);
-                let selector = el.tagName.toLowerCase();
-                if (el.className) {
-                    selector += '.' + Array.from(el.classList).map(cls => CSS.escape(cls)).join('.');
-                }
-                return selector;
-            }
-
-            // Heuristic 1: Look for Google AdSense containers
-            document.querySelectorAll('ins.adsbygoogle').forEach(adEl => {
-                const rect = adEl.getBoundingClientRect();
-                if (rect.width > 0 && rect.height > 0) { // Only consider visible ads
-                    adData.push({
-                        type: 'Google AdSense',
-                        selector: getElementSelector(adEl),
-                        width: rect.width,
-                        height: rect.height,
-                        x: rect.x,
-                        y: rect.y,
-                        link: adEl.querySelector('a')?.href || null,
-                        imageSrc: adEl.querySelector('img')?.src || null
-                    });
-                }
-            });
-
-            // Heuristic 2: Look for common ad iframes
-            document.querySelectorAll('iframe').forEach(iframeEl => {
-                const rect = iframeEl.getBoundingClientRect();
-                if (rect.width > 0 && rect.height > 0) {
-                    let adType = 'Unknown External Ad';
-                    let iframeSrc = iframeEl.src || null;
-
-                    if (iframeSrc && iframeSrc.includes('recaptcha')) { // Exclude reCAPTCHA
-                        return; 
-                    } else if (iframeSrc && (iframeSrc.includes('google') || iframeSrc.includes('doubleclick'))) {
-                        adType = 'Google Ad (iframe)';
-                    } else if (iframeSrc && !iframeSrc.includes(window.location.hostname)) {
-                        adType = 'External Ad (iframe)';
-                    } else if (iframeSrc && iframeSrc.includes(window.location.hostname)) {
-                        adType = 'Internal Ad (iframe)'; 
-                    }
-
-                    let link = null;
-                    let imageSrc = null;
-                    try {
-                        if (iframeEl.contentWindow && iframeEl.contentWindow.document) {
-                            link = iframeEl.contentWindow.document.querySelector('a')?.href;
-                            imageSrc = iframeEl.contentWindow.document.querySelector('img')?.src;
-                        }
-                    } catch (e) {
-                        // Cross-origin access blocked, link/imageSrc remain null
-                    }
-
-                    adData.push({
-                        type: adType,
-                        selector: getElementSelector(iframeEl),
-                        width: rect.width,
-                        height: rect.height,
-                        x: rect.x,
-                        y: rect.y,
-                        iframeSrc: iframeSrc,
-                        link: link,
-                        imageSrc: imageSrc
-                    });
-                }
-            });
-
-            // Heuristic 3: Look for divs with common ad classes/ids (refine as needed)
-            const genericAdSelectors = [
-                'div[id*="ad"]', 'div[class*="ad-"]', 'div[class*="banner"]',
-                'div[class*="advert"]', 'div[data-ad-type]',
-                'div.gfg-ad-cont', 'div.ad_content_wrapper' // Example specific to GFG
-            ];
-            genericAdSelectors.forEach(selector => {
-                document.querySelectorAll(selector).forEach(el => {
-                    const rect = el.getBoundingClientRect();
-                    const currentSelector = getElementSelector(el);
-                    if (rect.width > 0 && rect.height > 0 && 
-                        !adData.some(item => item.selector === currentSelector || 
-                                             (Math.abs(item.x - rect.x) < 5 && Math.abs(item.y - rect.y) < 5 && Math.abs(item.width - rect.width) < 5 && Math.abs(item.height - rect.height) < 5))) {
-                        
-                        let adType = 'Generic Ad';
-                        const link = el.querySelector('a')?.href;
-                        if (link && link.includes(window.location.hostname)) {
-                            adType = 'Internal Ad';
-                        } else if (link) {
-                            adType = 'External Ad';
-                        }
-
-                        adData.push({
-                            type: adType,
-                            selector: currentSelector,
-                            width: rect.width,
-                            height: rect.height,
-                            x: rect.x,
-                            y: rect.y,
-                            link: link,
-                            imageSrc: el.querySelector('img')?.src || null
-                        });
-                    }
-                });
-            });
-
-            return JSON.stringify(adData);
-        })();
-        """
-
-        js_raw_results = page.evaluate(js_ad_detection_script)
+        # Keep the result as a handle so the detected elements come back as
+        # ElementHandles and never need to be re-located by selector
+        detection_handle = await page.evaluate_handle("() => window.__extractAds()")
+        js_raw_results = await (await detection_handle.get_property("json")).json_value()
+        elements_handle = await detection_handle.get_property("elements")
+        ad_element_handles = await elements_handle.get_properties()
         
         try:
-            identified_ads = json.loads(js_raw_results)
+            if orjson:
+                identified_ads = orjson.loads(js_raw_results)
+            else:
+                identified_ads = json.loads(js_raw_results)
         except json.JSONDecodeError as e:
             print(f"Error decoding JSON from JS execution: {e}")
             print(f"Raw JS result: {js_raw_results}")
@@ -202,60 +423,129 @@ def extract_ads_with_playwright(url: str, output_file: str):
 
         print(f"Found {len(identified_ads)} potential ad elements from JS detection.")
 
-        # --- Iterate through identified ads and take screenshots ---
-        for i, ad_info in enumerate(identified_ads):
+        # --- Take screenshots of identified ads ---
+        # Each screenshot costs several CDP round-trips, so issue them concurrently
+        # (bounded by a semaphore) to overlap that latency instead of paying it serially
+        screenshot_semaphore = asyncio.Semaphore(MAX_CONCURRENT_SCREENSHOTS)
+        viewport = page.viewport_size
+
+        def get_viewport_clip(ad_info):
+            """Returns the ad's detected rect as a screenshot clip if it lies fully inside the viewport."""
+            if not viewport:
+                return None
+            clip = {key: round(ad_info.get(key, 0)) for key in ("x", "y", "width", "height")}
+            if (clip["x"] < 0 or clip["y"] < 0 or
+                    clip["x"] + clip["width"] > viewport["width"] or
+                    clip["y"] + clip["height"] > viewport["height"]):
+                return None
+            return clip
+
+        async def take_ad_screenshot(i, ad_info, clip):
             selector = ad_info.get("selector")
             # Only try to screenshot if the element has valid dimensions for a visible ad
             if not selector or ad_info.get('width', 0) <= 5 or ad_info.get('height', 0) <= 5: # Minimal size for an ad
                 print(f"Warning: Ad {i} ('{ad_info.get('type', 'Unknown')}') has invalid dimensions or no selector. Skipping screenshot.")
                 ad_info['screenshot_path'] = "N/A (invalid dimensions or no selector)"
-                ad_results.append(ad_info)
-                continue # Skip to next ad
+                return
 
-            try:
-                ad_element = page.locator(selector).first
-
-                if ad_element and ad_element.is_visible():
-                    # Sanitize ad type for filename
-                    clean_ad_type = ad_info['type'].replace(' ', '_').replace('(', '').replace(')', '').replace('/', '_')
-                    screenshot_name = f"ad_{i}_{clean_ad_type}_{int(ad_info['width'])}x{int(ad_info['height'])}.png"
-                    screenshot_path = screenshots_dir / screenshot_name
-                    
-                    print(f"Attempting screenshot for ad {i} ({ad_info['type']}) at {screenshot_path}")
-                    ad_element.screenshot(path=str(screenshot_path))
-                    ad_info['screenshot_path'] = str(screenshot_path)
-                else:
-                    print(f"Warning: Ad element for selector '{selector}' not found or not visible. Skipping screenshot.")
-                    ad_info['screenshot_path'] = "N/A (element not found or visible)"
-
-            except Exception as e:
-                print(f"Error taking screenshot for ad {i} (selector: {selector}): {e}")
-                ad_info['screenshot_path'] = f"Error: {e}"
-            
-            ad_results.append(ad_info)
+            # Sanitize ad type for filename
+            clean_ad_type = ad_info['type'].translate(AD_TYPE_FILENAME_TABLE)
+            screenshot_name = f"ad_{i}_{clean_ad_type}_{int(ad_info['width'])}x{int(ad_info['height'])}.png"
+            screenshot_path = screenshots_dir / screenshot_name
+
+            async with screenshot_semaphore:
+                try:
+                    if clip:
+                        # The rect from detection is still valid, so skip resolving the element
+                        print(f"Attempting screenshot for ad {i} ({ad_info['type']}) at {screenshot_path}")
+                        await page.screenshot(path=str(screenshot_path), clip=clip)
+                        ad_info['screenshot_path'] = str(screenshot_path)
+                        return
 
-        browser.close()
+                    element_handle = ad_element_handles.get(str(i))
+                    ad_element = element_handle.as_element() if element_handle else None
+
+                    if ad_element and await ad_element.is_visible():
+                        print(f"Attempting screenshot for ad {i} ({ad_info['type']}) at {screenshot_path}")
+                        await ad_element.screenshot(path=str(screenshot_path))
+                        ad_info['screenshot_path'] = str(screenshot_path)
+                    else:
+                        print(f"Warning: Ad element for selector '{selector}' not found or not visible. Skipping screenshot.")
+                        ad_info['screenshot_path'] = "N/A (element not found or visible)"
+
+                except Exception as e:
+                    print(f"Error taking screenshot for ad {i} (selector: {selector}): {e}")
+                    ad_info['screenshot_path'] = f"Error: {e}"
+
+        # Ads inside the viewport are clipped straight from the page. Element screenshots
+        # scroll their target into view, which would shift the detected rects, so the
+        # out-of-viewport ads only go once every clip screenshot has been taken
+        clips = [get_viewport_clip(ad_info) for ad_info in identified_ads]
+        await asyncio.gather(
+            *(take_ad_screenshot(i, ad_info, clips[i]) for i, ad_info in enumerate(identified_ads) if clips[i])
+        )
+        await asyncio.gather(
+            *(take_ad_screenshot(i, ad_info, None) for i, ad_info in enumerate(identified_ads) if not clips[i])
+        )
+        ad_results = identified_ads
+    finally:
+        await context.close()
 
     # --- Save all results to a JSON file ---
-    final_output = {
-        "url": url,
-        "total_ads_identified": len(ad_results),
-        "ad_data": ad_results
-    }
-    
-    with open(output_file, 'w', encoding='utf-8') as f:
-        json.dump(final_output, f, indent=4, ensure_ascii=False)
+    save_results(output_file, url, ad_results)
     
     print(f"\nAd extraction complete. Results saved to {output_file}")
     print(f"Screenshots saved to: {screenshots_dir}")
 
 
+async def extract_ads_from_stdin(output_file: str):
+    """
+    Reads URLs from stdin, one per line, and extracts ads from each on the shared browser.
+    Each URL's results go next to output_file, suffixed with the sanitised URL name
+    and a short hash of the full URL.
+    """
+    output_path = Path(output_file)
+    while True:
+        line = await asyncio.to_thread(sys.stdin.readline)
+        if not line:
+            break
+        url = line.strip()
+        if not url:
+            continue
+        # The short hash of the full URL keeps URLs that share a last path segment
+        # (/a/index and /b/index, or two sites' "/") from overwriting each other
+        url_hash = hashlib.sha1(url.encode("utf-8")).hexdigest()[:8]
+        url_output_file = output_path.with_name(
+            f"{output_path.stem}_{sanitize_url_path(url)}_{url_hash}{output_path.suffix}"
+        )
+        # One failing page (a redirect destroying the execution context, a bad
+        # screenshot path, ...) must not end the batch for the URLs after it
+        try:
+            await extract_ads_with_playwright(url, str(url_output_file))
+        except Exception as e:
+            print(f"Error extracting ads from {url}: {e}")
+
+
+async def main(args):
+    try:
+        if args.batch:
+            await extract_ads_from_stdin(args.outfile)
+        else:
+            await extract_ads_with_playwright(args.url, args.outfile)
+    finally:
+        await close_browser()
+
+
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Extracts ad information from a webpage using Playwright.")
-    parser.add_argument("--url", required=True, help="The URL of the webpage to scrape.")
+    parser.add_argument("--url", help="The URL of the webpage to scrape.")
+    parser.add_argument("--batch", action="store_true",
+                        help="Read URLs from stdin (one per line) and process them all on a single browser.")
     parser.add_argument("--outfile", default="ad_extraction_results.json",
                         help="Path to the output JSON file. Defaults to 'ad_extraction_results.json'.")
     
     args = parser.parse_args()
+    if not args.url and not args.batch:
+        parser.error("one of --url or --batch is required")
     
-    extract_ads_with_playwright(args.url, args.outfile)
\ No newline at end of file
+    asyncio.run(main(args))
\ No newline at end of file
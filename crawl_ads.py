@@ -4,44 +4,101 @@ from crawl4ai import AsyncWebCrawler, CrawlerRunConfig, BrowserConfig
 from crawl4ai.async_configs import CacheMode
 import json
 
+try:
+    import orjson
+except ImportError:  # orjson is an optional speed-up, fall back to stdlib json
+    orjson = None
+
 def save_json(data, outfile):
-    # Open the file in write mode
-    with open(outfile, "w") as file:
-        # Convert the dictionary to a JSON string and write it to the file
-        json.dump(data, file, indent=4)  # `indent=4` adds pretty formatting
+    if orjson:
+        # orjson serializes straight to UTF-8 bytes, so write in binary mode
+        with open(outfile, "wb") as file:
+            file.write(orjson.dumps(data, option=orjson.OPT_INDENT_2))
+        return
+    # Open the file in binary mode and write UTF-8 directly, so the output matches orjson's
+    with open(outfile, "wb") as file:
+        # Convert the dictionary to a JSON string in one go and write it with a single call
+        file.write(json.dumps(data, indent=4, ensure_ascii=False).encode("utf-8"))  # `indent=4` adds pretty formatting
 
-async def crawl_with_ads(url: str, outfile: str): 
-    # Streamlined JS code
-    # Define your JavaScript code as a multi-line string
-# This version is an IIFE that returns the JSON string
-    js_code_string = """
-    (function() {
+# Streamlined JS code, shared by every crawl that collects ads
+# Installed once per page as an init script, so V8 compiles it once and every
+# crawl only sends the short AD_EXTRACTION_JS call below
+AD_EXTRACTION_INIT_JS = """
+    window.__extract_ads = function() {
+        // Single extraction pass over the page as crawl4ai left it
         const adData = [];
+        const host = window.location.hostname;
+
+        // Helper to get a unique selector for an element, memoized per element
+        const selectorCache = new WeakMap();
 
-        // Helper to get a unique selector for an element
         function getElementSelector(el) {
             if (!el || typeof el.tagName === 'undefined') {
                 return null;
             }
-            if (el.id) return `#${el.id}`;
-            let selector = el.tagName.toLowerCase();
-            if (el.className) {
-                selector += '.' + Array.from(el.classList).join('.');
+            if (selectorCache.has(el)) return selectorCache.get(el);
+            let selector;
+            if (el.id) {
+                selector = `#${el.id}`;
+            } else {
+                selector = el.tagName.toLowerCase();
+                if (el.classList.length > 0) {
+                    selector += '.' + Array.from(el.classList).join('.');
+                }
             }
+            selectorCache.set(el, selector);
             return selector;
         }
 
+        // Classifies an ad iframe from its src with one regex test and a single host check;
+        // returns null for iframes that are not ads (reCAPTCHA)
+        const googleAdSrcPattern = /google|doubleclick/;
+
+        function classifyIframe(src) {
+            if (src.includes('recaptcha')) return null;
+            if (googleAdSrcPattern.test(src)) return 'Google Ad (iframe)';
+            const onHost = src.includes(host);
+            if (src !== 'N/A' && !onHost) return 'External Ad (iframe)';
+            return onHost ? 'Internal Ad (iframe)' : 'Unknown External Ad';
+        }
+
+        // First link href and image src under root, found in one subtree walk rather than
+        // separate querySelector('a') and querySelector('img') traversals
+        function getLinkAndImage(root) {
+            let link;
+            let imageSrc;
+            for (const node of root.querySelectorAll('a, img')) {
+                if (link === undefined && node.tagName === 'A') {
+                    link = node.href;
+                } else if (imageSrc === undefined && node.tagName === 'IMG') {
+                    imageSrc = node.src;
+                }
+                if (link !== undefined && imageSrc !== undefined) break;
+            }
+            return { link, imageSrc };
+        }
+
+        // Selectors already recorded, so the generic heuristic's duplicate
+        // check is a hashed lookup instead of a scan over adData
+        const seenSelectors = new Set();
+
+        function addAd(ad) {
+            seenSelectors.add(ad.selector);
+            adData.push(ad);
+        }
+
         // Heuristic 1: Look for Google AdSense containers
         document.querySelectorAll('ins.adsbygoogle').forEach(adEl => {
             const rect = adEl.getBoundingClientRect();
             if (rect.width > 0 && rect.height > 0) { // Only consider visible ads
-                adData.push({
+                const { link, imageSrc } = getLinkAndImage(adEl);
+                addAd({
                     type: 'Google AdSense',
                     selector: getElementSelector(adEl),
                     width: rect.width,
                     height: rect.height,
-                    link: adEl.querySelector('a')?.href || 'N/A',
-                    imageSrc: adEl.querySelector('img')?.src || 'N/A'
+                    link: link || 'N/A',
+                    imageSrc: imageSrc || 'N/A'
                 });
             }
         });
@@ -50,17 +107,10 @@ async def crawl_with_ads(url: str, outfile: str):
         document.querySelectorAll('iframe').forEach(iframeEl => {
             const rect = iframeEl.getBoundingClientRect();
             if (rect.width > 0 && rect.height > 0) {
-                let adType = 'Unknown External Ad';
-                let iframeSrc = iframeEl.src || 'N/A';
-
-                if (iframeSrc.includes('recaptcha')) { // Exclude reCAPTCHA
+                const iframeSrc = iframeEl.src || 'N/A';
+                const adType = classifyIframe(iframeSrc);
+                if (adType === null) { // Exclude reCAPTCHA
                     return; // Skip this iframe
-                } else if (iframeSrc.includes('google') || iframeSrc.includes('doubleclick')) {
-                    adType = 'Google Ad (iframe)';
-                } else if (iframeSrc !== 'N/A' && !iframeSrc.includes(window.location.hostname)) {
-                    adType = 'External Ad (iframe)';
-                } else if (iframeSrc.includes(window.location.hostname)) {
-                    adType = 'Internal Ad (iframe)';
                 }
 
                 let iframeDoc = null;
@@ -72,68 +122,88 @@ async def crawl_with_ads(url: str, outfile: str):
                     // Cross-origin iframe, contentDocument is not accessible
                 }
 
-                adData.push({
+                const { link, imageSrc } = iframeDoc ? getLinkAndImage(iframeDoc) : {};
+                addAd({
                     type: adType,
                     selector: getElementSelector(iframeEl),
                     width: rect.width,
                     height: rect.height,
                     iframeSrc: iframeSrc,
-                    link: iframeDoc?.querySelector('a')?.href || 'N/A',
-                    imageSrc: iframeDoc?.querySelector('img')?.src || 'N/A'
+                    link: link || 'N/A',
+                    imageSrc: imageSrc || 'N/A'
                 });
             }
         });
 
         // Heuristic 3: Look for divs with common ad classes/ids
-        const genericAdSelectors = [
-            'div[id*="ad"]', 'div[class*="ad-"]', 'div[class*="banner"]',
-            'div[class*="advert"]', 'div[data-ad-type]',
-            'div.gfg-ad-cont', 'div.ad_content_wrapper'
-        ];
-        genericAdSelectors.forEach(selector => {
-            document.querySelectorAll(selector).forEach(el => {
-                const rect = el.getBoundingClientRect();
-                if (rect.width > 0 && rect.height > 0 && !adData.some(item => item.selector === getElementSelector(el))) {
-                    let adType = 'Generic Ad';
-                    const link = el.querySelector('a')?.href;
-                    if (link && link.includes(window.location.hostname)) {
-                        adType = 'Internal Ad';
-                    } else if (link) {
-                        adType = 'External Ad';
-                    }
-
-                    adData.push({
-                        type: adType,
-                        selector: getElementSelector(el),
-                        width: rect.width,
-                        height: rect.height,
-                        link: link || 'N/A',
-                        imageSrc: el.querySelector('img')?.src || 'N/A'
-                    });
+        // One walk over the divs with a precompiled class pattern, instead of substring
+        // attribute selectors (the engine's slow path). Matches ids containing "ad",
+        // classes containing "ad-", "banner", "advert" or "ad_content_wrapper", and data-ad-type
+        const genericAdClassPattern = /ad-|banner|advert|ad_content_wrapper/;
+        for (const el of document.getElementsByTagName('div')) {
+            if (!el.id.includes('ad') && !genericAdClassPattern.test(el.className) && !el.hasAttribute('data-ad-type')) {
+                continue;
+            }
+            const rect = el.getBoundingClientRect();
+            const currentSelector = getElementSelector(el);
+            if (rect.width > 0 && rect.height > 0 && !seenSelectors.has(currentSelector)) {
+                let adType = 'Generic Ad';
+                const { link, imageSrc } = getLinkAndImage(el);
+                if (link && link.includes(host)) {
+                    adType = 'Internal Ad';
+                } else if (link) {
+                    adType = 'External Ad';
                 }
-            });
-        });
 
-        // Return the data directly from the IIFE
+                addAd({
+                    type: adType,
+                    selector: currentSelector,
+                    width: rect.width,
+                    height: rect.height,
+                    link: link || 'N/A',
+                    imageSrc: imageSrc || 'N/A'
+                });
+            }
+        }
+
         return JSON.stringify(adData);
-    })(); // <--- Don't forget to invoke the function!
-    """
+    };
+"""
+
+# crawl4ai runs js_code as the body of an async function, so the call
+# must `return` its result to js_execution_result
+AD_EXTRACTION_JS = "return window.__extract_ads();"
+
+async def install_ad_extractor(page, context, **kwargs):
+    # crawl4ai on_page_context_created hook: define window.__extract_ads before navigation
+    await page.add_init_script(AD_EXTRACTION_INIT_JS)
+    return page
 
+async def crawl_with_ads(url: str, outfile: str): 
     config2 = CrawlerRunConfig(
-        js_code = js_code_string,
+        js_code = AD_EXTRACTION_JS,
         wait_until="domcontentloaded",
         
         # Key settings for news sites:
         wait_for="js:() => document.readyState === 'complete'",  # Wait for your data
         verbose=True, 
         page_timeout= 120000, # 60 s
-        cache_mode=CacheMode.DISABLED
+        cache_mode=CacheMode.DISABLED,
         
         # Don't wait for network idle (news sites never idle)
-        # wait_for_images=False,  # Skip waiting for all images
+        wait_for_images=False,  # Skip waiting for all images
     )
 
-    async with AsyncWebCrawler() as crawler:
+    # Only the ad DOM is needed here, so skip downloading and decoding images entirely
+    browser_config = BrowserConfig(
+        extra_args=[
+            "--blink-settings=imagesEnabled=false",
+            "--disable-features=IsolateOrigins,site-per-process",
+        ]
+    )
+
+    async with AsyncWebCrawler(config=browser_config) as crawler:
+        crawler.crawler_strategy.set_hook("on_page_context_created", install_ad_extractor)
         result = await crawler.arun(url=url, config=config2)
         if result.success: 
             save_json(data=result.js_execution_result , outfile=outfile)
@@ -141,10 +211,41 @@ async def crawl_with_ads(url: str, outfile: str):
         else:
             print(f"[-] Crawl failed for {url}: {result.error_message}")
 
+async def crawl_markdown_and_ads(url: str, markdown_outfile: str, ads_outfile: str):
+    # One crawl for both outputs: the page is loaded and rendered once, then the markdown
+    # (as crawl.py would save it) and the ad data are both taken from the same result
+    config = CrawlerRunConfig(
+        js_code = AD_EXTRACTION_JS,
+
+        # Same lazy-content handling as crawl.py so the markdown is complete
+        wait_for_images = True,
+        scan_full_page = True,
+        scroll_delay = 0.5,
+        cache_mode = CacheMode.BYPASS,
+        verbose = True
+    )
+
+    async with AsyncWebCrawler() as crawler:
+        crawler.crawler_strategy.set_hook("on_page_context_created", install_ad_extractor)
+        result = await crawler.arun(url=url, config=config)
+        if result.success:
+            with open(markdown_outfile, "w", encoding="utf-8") as f:
+                f.write(result.markdown)
+            print(f"[+] Saved markdown to: {markdown_outfile}")
+            save_json(data=result.js_execution_result , outfile=ads_outfile)
+            print(f"[+] Saved ad content to: {ads_outfile}")
+        else:
+            print(f"[-] Crawl failed for {url}: {result.error_message}")
+
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Crawl a webpage and save as Markdown using crawl4ai")
     parser.add_argument("--url", required=True, help="URL of the webpage to crawl")
     parser.add_argument("--outfile", required=True, help="Path to save the Markdown file")
+    parser.add_argument("--markdown-outfile",
+                        help="Also save the page as Markdown, taken from the same crawl instead of a second run of crawl.py")
     args = parser.parse_args()
 
-    asyncio.run(crawl_with_ads(args.url, args.outfile))
+    if args.markdown_outfile:
+        asyncio.run(crawl_markdown_and_ads(args.url, args.markdown_outfile, args.outfile))
+    else:
+        asyncio.run(crawl_with_ads(args.url, args.outfile))
@@ -1,101 +1,370 @@
 import os
+import re
 import json
+import asyncio
 import argparse
-from urllib.parse import urlparse, urljoin
-from playwright.sync_api import sync_playwright, TimeoutError as PlaywrightTimeout
+import hashlib
+import functools
+from collections import defaultdict
+from urllib.parse import urlparse, urljoin, urlsplit
+import httpx
+from lxml import etree, html as lxml_html
+from playwright.async_api import async_playwright, TimeoutError as PlaywrightTimeout
+
+try:
+    import orjson
+except ImportError:  # orjson is an optional speed-up, fall back to stdlib json
+    orjson = None
 
 # -------------------------------
 # CONFIG
 # -------------------------------
 TIMEOUT = 15000          # 15 seconds timeout
-WAIT_STRATEGIES = ["domcontentloaded", "load"]  # fallback strategies
+RENDER_IDLE_TIMEOUT = 3000  # ms to let a JS-rendered page settle after "load"
+MAX_CONCURRENCY = 5      # pages processed in parallel when several URLs are given
+MAX_PER_HOST = 2         # pages fetched in parallel from any single host
+HTTP_TIMEOUT = 10        # seconds for the plain-HTTP fast path
+MIN_STATIC_ANCHORS = 3   # fewer links than this suggests a JS-rendered page
+BLOCKED_RESOURCE_TYPES = {"image", "font", "media", "stylesheet"}  # not needed for text and links
+TRACKER_URL_PATTERN = re.compile(r"(doubleclick\.net|googlesyndication\.com|pubmatic\.com)")
+USER_AGENT = (
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
+    "AppleWebKit/537.36 (KHTML, like Gecko) "
+    "Chrome/119.0.0.0 Safari/537.36"
+)
 
 
 # -------------------------------
 # HELPERS
 # -------------------------------
+@functools.lru_cache(maxsize=1024)
+def _ensure_dir(path):
+    """Create a directory once per run; repeat calls for the same path are free."""
+    os.makedirs(path, exist_ok=True)
+
+
+def _write_bytes(path, data):
+    """Write a small payload with raw os.open/os.write, skipping the buffered file layer."""
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+    try:
+        view = memoryview(data)
+        while view:
+            view = view[os.write(fd, view):]
+    finally:
+        os.close(fd)
+
+
+def text_file_name(url):
+    """Fixed-length file name for a page: 16 hex chars of the URL's blake2b digest."""
+    return hashlib.blake2b(url.encode("utf-8"), digest_size=8).hexdigest()
+
+
+def save_text_index(domain, urls):
+    """Merge digest -> URL entries into text/<domain>/index.json"""
+    _ensure_dir(f"text/{domain}")
+    index_path = f"text/{domain}/index.json"
+    try:
+        with open(index_path, "rb") as f:
+            index = json.loads(f.read())
+    except (OSError, ValueError):
+        index = {}
+    index.update({text_file_name(url): url for url in urls})
+
+    if orjson:
+        payload = orjson.dumps(index, option=orjson.OPT_INDENT_2)
+    else:
+        payload = json.dumps(index, indent=2, ensure_ascii=False).encode("utf-8")
+    _write_bytes(index_path, payload)
+    return index_path
+
+
 def save_text(domain, url, structured_text):
-    """Save structured text into text/<domain>/<page>.txt"""
-    safe_name = url.replace("https://", "").replace("http://", "").replace("/", "_")
-    os.makedirs(f"text/{domain}", exist_ok=True)
-    text_path = f"text/{domain}/{safe_name}.txt"
-
-    with open(text_path, "w", encoding="utf-8") as f:
-        for section, content in structured_text.items():
-            f.write(f"\n=== {section.upper()} ===\n")
-            if isinstance(content, list):
-                for item in content:
-                    f.write(f"- {item}\n")
-            else:
-                f.write(f"{content}\n")
+    """Save structured text into text/<domain>/<digest>.txt (see save_text_index)"""
+    _ensure_dir(f"text/{domain}")
+    text_path = f"text/{domain}/{text_file_name(url)}.txt"
+
+    # Build the whole file in memory and write it with a single call
+    parts = []
+    for section, content in structured_text.items():
+        parts.append(f"\n=== {section.upper()} ===\n")
+        if isinstance(content, list):
+            parts.extend(f"- {item}\n" for item in content)
+        else:
+            parts.append(f"{content}\n")
+
+    _write_bytes(text_path, "".join(parts).encode("utf-8"))
     return text_path
 
 
-def save_json(domain, data):
-    """Save structured JSON data to processed/<domain>.json"""
-    os.makedirs("processed", exist_ok=True)
-    json_path = f"processed/{domain}.json"
-    with open(json_path, "w", encoding="utf-8") as f:
-        json.dump(data, f, indent=2, ensure_ascii=False)
+def save_json(domain, url, data):
+    """Save structured JSON data to processed/<domain>/<digest>.json (see save_text_index)"""
+    _ensure_dir(f"processed/{domain}")
+    json_path = f"processed/{domain}/{text_file_name(url)}.json"
+    if orjson:
+        # orjson writes UTF-8 bytes directly, same layout as the stdlib call below
+        payload = orjson.dumps(data, option=orjson.OPT_INDENT_2)
+    else:
+        payload = json.dumps(data, indent=2, ensure_ascii=False).encode("utf-8")
+    _write_bytes(json_path, payload)
     return json_path
 
 
-def extract_links(page, base_url, local_domain):
+# Collects internal links in the page itself: a.href is already absolute,
+# a.host is compared to the crawled host and fragments are dropped
+INTERNAL_LINKS_JS = """
+(localHost) => {
+    const links = new Set();
+    for (const a of document.querySelectorAll('a[href]')) {
+        // empty and fragment-only hrefs point back at this page
+        const target = a.getAttribute('href').split('#')[0].trim();
+        if (target && a.host === localHost) {
+            links.add(a.href.split('#')[0]);
+        }
+    }
+    return Array.from(links);
+}
+"""
+
+
+async def extract_links(page, local_domain):
     """Extract internal links only from the given page."""
-    anchors = page.query_selector_all("a[href]")
+    links = await page.evaluate(INTERNAL_LINKS_JS, local_domain)
+    return sorted(links)
+
+
+SECTION_SELECTORS = {
+    "title": "title",
+    "headers": "h1, h2, h3, h4, h5, h6",
+    "paragraphs": "p",
+    "buttons": "button, input[type='button'], input[type='submit']",
+    "links_text": "a",
+    "lists": "li",
+    "footer": "footer",
+}
+
+# Tag name -> section, so every section is filled from a single
+# querySelectorAll pass over the combined selector (one DOM walk, not seven)
+SECTION_BY_TAG = {
+    "TITLE": "title",
+    **{f"H{level}": "headers" for level in range(1, 7)},
+    "P": "paragraphs",
+    "BUTTON": "buttons",
+    "INPUT": "buttons",
+    "A": "links_text",
+    "LI": "lists",
+    "FOOTER": "footer",
+}
+STRUCTURED_TEXT_ARGS = {
+    "selector": ", ".join(SECTION_SELECTORS.values()),
+    "sectionByTag": SECTION_BY_TAG,
+}
+
+# Reads every section plus the raw body text in one round-trip
+STRUCTURED_TEXT_JS = """
+({ selector, sectionByTag }) => {
+    const structured = {};
+    for (const section of new Set(Object.values(sectionByTag))) {
+        structured[section] = [];
+    }
+    for (const el of document.querySelectorAll(selector)) {
+        const text = (el.innerText || '').trim();
+        if (text) {
+            structured[sectionByTag[el.tagName.toUpperCase()]].push(text);
+        }
+    }
+    // For completeness, also store raw visible body text (fallback)
+    structured.body_text = document.body ? document.body.innerText : '';
+    return structured;
+}
+"""
+
+
+async def extract_structured_text(page):
+    """Extract text grouped by semantic page sections."""
+    try:
+        return await page.evaluate(STRUCTURED_TEXT_JS, STRUCTURED_TEXT_ARGS)
+    except Exception:
+        structured = {section: [] for section in SECTION_SELECTORS}
+        structured["body_text"] = ""
+        return structured
+
+
+HTML_SECTION_XPATHS = {
+    "title": "//title",
+    "headers": "//h1 | //h2 | //h3 | //h4 | //h5 | //h6",
+    "paragraphs": "//p",
+    "buttons": "//button | //input[@type='button'] | //input[@type='submit']",
+    "links_text": "//a",
+    "lists": "//li",
+    "footer": "//footer",
+}
+
+
+SKIPPED_HREF_SCHEMES = ("mailto:", "javascript:", "tel:")
+
+
+def extract_links_from_html(tree, base_url, local_domain):
+    """Same as extract_links, for a page parsed with lxml."""
+    base = urlsplit(base_url)
+    origin = f"{base.scheme}://{base.netloc}"
+    same_host = base.netloc == local_domain
     links = set()
-    for a in anchors:
-        href = a.get_attribute("href")
-        if not href:
+    for href in tree.xpath("//a/@href"):
+        if href.startswith(SKIPPED_HREF_SCHEMES):
             continue
+        target = href.split("#")[0]
+        if not target.strip():
+            # empty and fragment-only hrefs point back at this page
+            continue
+        # Root-relative and same-origin hrefs need no urljoin; dot segments and
+        # empty queries still go through it so they are normalized the same way
+        if same_host and "/." not in target and not target.endswith("?"):
+            if target.startswith(origin) and target[len(origin):len(origin) + 1] in ("", "/", "?"):
+                links.add(target)
+                continue
+            if target.startswith("/") and not target.startswith("//"):
+                links.add(origin + target)
+                continue
         abs_url = urljoin(base_url, href)
-        parsed = urlparse(abs_url)
-        if parsed.netloc == local_domain:
+        if urlsplit(abs_url).netloc == local_domain:
             links.add(abs_url.split("#")[0])
     return sorted(list(links))
 
 
-def extract_structured_text(page):
-    """Extract text grouped by semantic page sections."""
+# Elements that start a new line when rendered; text on either side of them is
+# separated, while inline tags (<b>, <a>, <sub>, ...) join their text as-is
+BLOCK_TAGS = frozenset({
+    "address", "article", "aside", "blockquote", "br", "dd", "div", "dl", "dt",
+    "fieldset", "figcaption", "figure", "footer", "form", "h1", "h2", "h3", "h4",
+    "h5", "h6", "header", "hr", "li", "main", "nav", "ol", "p", "pre", "section",
+    "table", "tbody", "td", "tfoot", "th", "thead", "tr", "ul",
+})
+
+
+def element_text(el):
+    """Visible text of an lxml element, roughly like innerText.
+
+    Block-level and <br> boundaries become a space, inline tags add nothing,
+    and runs of whitespace collapse to one space.
+    """
+    parts = []
+    # Explicit stack instead of recursion, so deeply nested pages can't hit the limit.
+    # A string on the stack is a tail or separator to emit once the subtree is done
+    stack = [el]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, str):
+            parts.append(node)
+            continue
+        if node is not el and node.tail:
+            stack.append(node.tail)
+        if not isinstance(node.tag, str):  # comments and PIs are not text
+            continue
+        block = node.tag in BLOCK_TAGS
+        if block:
+            parts.append(" ")
+            stack.append(" ")
+        if node.text:
+            parts.append(node.text)
+        stack.extend(reversed(node))
+    return " ".join("".join(parts).split())
+
+
+def extract_structured_text_from_html(tree):
+    """Same as extract_structured_text, for a page parsed with lxml."""
     structured = {}
+    for section, xpath in HTML_SECTION_XPATHS.items():
+        texts = [element_text(el) for el in tree.xpath(xpath)]
+        structured[section] = [text for text in texts if text]
 
-    selectors = {
-        "title": "title",
-        "headers": "h1, h2, h3, h4, h5, h6",
-        "paragraphs": "p",
-        "buttons": "button, input[type='button'], input[type='submit']",
-        "links_text": "a",
-        "lists": "li",
-        "footer": "footer",
-    }
+    body = tree.find("body")
+    structured["body_text"] = element_text(body) if body is not None else ""
+    return structured
 
-    for section, selector in selectors.items():
-        try:
-            elements = page.query_selector_all(selector)
-            structured[section] = [
-                el.inner_text().strip() for el in elements if el.inner_text().strip()
-            ]
-        except Exception:
-            structured[section] = []
-
-    # For completeness, also store raw visible body text (fallback)
+
+def parse_static_html(content, encoding, base_url, local_domain):
+    """
+    Structured text and links from HTML fetched over plain HTTP. Runs in a
+    worker thread; returns None when the page needs a browser instead.
+    """
+    # Decode with the charset from the Content-Type header when there is one;
+    # otherwise lxml falls back to the page's <meta charset>
     try:
-        structured["body_text"] = page.inner_text("body")
-    except Exception:
-        structured["body_text"] = ""
+        parser = lxml_html.HTMLParser(encoding=encoding) if encoding else None
+        tree = lxml_html.document_fromstring(content, parser=parser)
+    except (etree.ParserError, ValueError, LookupError):
+        return None
 
-    return structured
+    # A JS shell has few links and no paragraph text; let the browser render it
+    if len(tree.xpath("//a[@href]")) < MIN_STATIC_ANCHORS:
+        return None
+    if not any(p.text_content().strip() for p in tree.xpath("//p")):
+        return None
 
+    # Script and style bodies are not visible text
+    for el in tree.xpath("//script | //style | //noscript"):
+        el.drop_tree()
+    return extract_structured_text_from_html(tree), extract_links_from_html(tree, base_url, local_domain)
 
-# -------------------------------
-# MAIN FUNCTION
-# -------------------------------
-def parse_single_page(start_url):
-    local_domain = urlparse(start_url).netloc
-    results = {}
 
-    with sync_playwright() as p:
-        browser = p.chromium.launch(
+async def fetch_static(client, url, local_domain):
+    """
+    Fetch a page over plain HTTP. Returns (structured_text, links) when the HTML
+    already carries the content, or None when the page needs a browser.
+    """
+    try:
+        response = await client.get(url, timeout=HTTP_TIMEOUT, follow_redirects=True)
+    except httpx.HTTPError:
+        return None
+    if response.status_code != 200 or "html" not in response.headers.get("content-type", ""):
+        return None
+
+    # Parse off the event loop, like rendered pages, so other fetches keep going
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        None, parse_static_html, response.content, response.charset_encoding, str(response.url), local_domain
+    )
+
+
+def parse_rendered_html(html, base_url, local_domain):
+    """
+    Structured text and links from a rendered page's HTML, parsed with lxml.
+    Runs in a worker thread; returns None if the HTML cannot be parsed.
+    """
+    try:
+        tree = lxml_html.document_fromstring(html)
+    except (etree.ParserError, ValueError):
+        return None
+    for el in tree.xpath("//script | //style | //noscript"):
+        el.drop_tree()
+    return extract_structured_text_from_html(tree), extract_links_from_html(tree, base_url, local_domain)
+
+
+async def _block_heavy_requests(route):
+    """Aborts heavy resources and tracker requests and lets everything else through."""
+    request = route.request
+    if request.resource_type in BLOCKED_RESOURCE_TYPES or TRACKER_URL_PATTERN.search(request.url):
+        await route.abort()
+    else:
+        await route.continue_()
+
+
+class LazyPagePool:
+    """
+    Pool of warm pages on one browser, launched on the first get(). Pages served
+    entirely by the HTTP fast path never pay for starting Chromium.
+    """
+
+    def __init__(self, size):
+        self.size = size
+        self._pages = None
+        self._launch_lock = asyncio.Lock()
+        self._playwright = None
+        self._browser = None
+
+    async def _launch(self):
+        self._playwright = await async_playwright().start()
+        self._browser = await self._playwright.chromium.launch(
             headless=True,
             args=[
                 "--no-sandbox",
@@ -104,61 +373,163 @@ def parse_single_page(start_url):
                 "--disable-gpu",
             ],
         )
-        context = browser.new_context(
-            user_agent=(
-                "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
-                "AppleWebKit/537.36 (KHTML, like Gecko) "
-                "Chrome/119.0.0.0 Safari/537.36"
-            )
-        )
+        context = await self._browser.new_context(user_agent=USER_AGENT)
+        await context.route("**/*", _block_heavy_requests)
+
+        # Warm pages are reused across URLs; the pool size bounds concurrency
+        pages = asyncio.Queue()
+        for _ in range(self.size):
+            pages.put_nowait(await context.new_page())
+        self._pages = pages
+
+    async def get(self):
+        if self._pages is None:
+            async with self._launch_lock:
+                if self._pages is None:
+                    await self._launch()
+        return await self._pages.get()
+
+    def put_nowait(self, page):
+        self._pages.put_nowait(page)
+
+    async def close(self):
+        if self._browser is not None:
+            await self._browser.close()
+        if self._playwright is not None:
+            await self._playwright.stop()
+
 
-        page = context.new_page()
+async def release_page(page_pool, page):
+    """Blank a pooled page and hand it back for the next URL."""
+    try:
+        await page.goto("about:blank")
+    except Exception:
+        pass
+    page_pool.put_nowait(page)
+
+
+# -------------------------------
+# MAIN FUNCTION
+# -------------------------------
+async def playwright_fetch(page_pool, start_url, local_domain):
+    """Render one URL on a pooled page and return its structured text and links."""
+    page = await page_pool.get()
+    try:
         print(f"🌐 Visiting {start_url}")
 
-        # Try multiple wait strategies to reduce timeouts
-        for wait_type in WAIT_STRATEGIES:
-            try:
-                page.goto(start_url, wait_until=wait_type, timeout=TIMEOUT)
-                break
-            except PlaywrightTimeout:
-                print(f"⚠️ Timeout on wait='{wait_type}', trying next...")
-        else:
-            print("❌ All wait strategies failed. Proceeding with partial load.")
+        # Only pages the static fetch judged JS-rendered get here, so let scripts run:
+        # wait for "load" (cheap with heavy resources blocked), then briefly for the
+        # network to go quiet so client-side rendering can finish
+        try:
+            await page.goto(start_url, wait_until="load", timeout=TIMEOUT)
+            await page.wait_for_load_state("networkidle", timeout=RENDER_IDLE_TIMEOUT)
+        except PlaywrightTimeout:
+            print("⚠️ Page did not settle in time. Proceeding with partial load.")
 
         # Optional: auto-accept cookie banners
         for selector in ['button:has-text("Accept")', 'button:has-text("OK")']:
             try:
-                if page.locator(selector).is_visible():
-                    page.click(selector)
+                if await page.locator(selector).is_visible():
+                    await page.click(selector)
                     print("✅ Accepted cookies banner.")
                     break
             except Exception:
                 pass
 
+        # Take the rendered HTML in one round-trip and parse it off the event loop,
+        # so Chromium does no text layout and other pages keep loading meanwhile
+        html = await page.content()
+        loop = asyncio.get_running_loop()
+        parsed = await loop.run_in_executor(None, parse_rendered_html, html, page.url, local_domain)
+        if parsed is not None:
+            return parsed
+
         # Extract structured content
-        structured_text = extract_structured_text(page)
+        structured_text = await extract_structured_text(page)
 
         # Extract links (internal only)
-        links = extract_links(page, start_url, local_domain)
+        links = await extract_links(page, local_domain)
+    finally:
+        await release_page(page_pool, page)
+
+    return structured_text, links
 
-        results = {
-            "url": start_url,
-            "domain": local_domain,
-            "structured_text": structured_text,
-            "links": links,
-        }
 
-        # Save files
-        text_path = save_text(local_domain, start_url, structured_text)
-        json_path = save_json(local_domain, results)
+async def fetch(client, page_pool, start_url, local_domain):
+    """Try the plain-HTTP fast path first and fall back to Playwright."""
+    parsed = await fetch_static(client, start_url, local_domain)
+    if parsed is None:
+        return await playwright_fetch(page_pool, start_url, local_domain)
+
+    print(f"⚡ Fetched {start_url} without a browser")
+    return parsed
+
+
+async def _parse_page(client, page_pool, global_semaphore, host_semaphores, start_url):
+    """Extract one URL and save its text and links."""
+    local_domain = urlparse(start_url).netloc
+
+    # Take the host slot first so a busy host does not hold a global slot while waiting
+    async with host_semaphores[local_domain], global_semaphore:
+        structured_text, links = await fetch(client, page_pool, start_url, local_domain)
+
+    results = {
+        "url": start_url,
+        "domain": local_domain,
+        "structured_text": structured_text,
+        "links": links,
+    }
 
-        browser.close()
+    # Save files
+    text_path = save_text(local_domain, start_url, structured_text)
+    json_path = save_json(local_domain, start_url, results)
 
     print(f"\n✅ Done! Extracted structured text and links from {start_url}")
     print(f"📁 Text saved at: {text_path}")
     print(f"📄 JSON saved at: {json_path}")
 
 
+async def parse_pages(urls, max_concurrency=MAX_CONCURRENCY):
+    """Extract several pages in parallel from one browser, at most max_concurrency at a time."""
+    # Chromium starts only when a page misses the HTTP fast path
+    page_pool = LazyPagePool(max(1, min(max_concurrency, len(urls))))
+
+    # Bounds the HTTP fast path too, which does not use a pooled page
+    global_semaphore = asyncio.Semaphore(max_concurrency)
+    host_semaphores = defaultdict(lambda: asyncio.Semaphore(MAX_PER_HOST))
+
+    try:
+        # One keep-alive client, so each host is resolved and connected once
+        async with httpx.AsyncClient(
+            http2=True, headers={"User-Agent": USER_AGENT}
+        ) as client:
+            outcomes = await asyncio.gather(
+                *(
+                    _parse_page(client, page_pool, global_semaphore, host_semaphores, url)
+                    for url in urls
+                ),
+                return_exceptions=True,
+            )
+    finally:
+        await page_pool.close()
+
+    saved_by_domain = {}
+    for url, outcome in zip(urls, outcomes):
+        if isinstance(outcome, Exception):
+            print(f"❌ Failed to extract {url}: {outcome}")
+        else:
+            saved_by_domain.setdefault(urlparse(url).netloc, []).append(url)
+
+    # Map the digest file names back to their URLs
+    for domain, saved_urls in saved_by_domain.items():
+        index_path = save_text_index(domain, saved_urls)
+        print(f"🗂️ Text index saved at: {index_path}")
+
+
+def parse_single_page(start_url):
+    asyncio.run(parse_pages([start_url]))
+
+
 # -------------------------------
 # ENTRY POINT (ARGPARSE)
 # -------------------------------
@@ -169,9 +540,16 @@ if __name__ == "__main__":
     parser.add_argument(
         "--url",
         type=str,
+        nargs="+",
         required=True,
-        help="The URL of the webpage to extract text and links from.",
+        help="The URL(s) of the webpage(s) to extract text and links from.",
+    )
+    parser.add_argument(
+        "--max-concurrency",
+        type=int,
+        default=MAX_CONCURRENCY,
+        help="How many pages to process in parallel when several URLs are given.",
     )
 
     args = parser.parse_args()
-    parse_single_page(args.url)
+    asyncio.run(parse_pages(args.url, args.max_concurrency))
@@ -5,9 +5,33 @@ from crawl4ai import AsyncWebCrawler, CrawlerRunConfig, BrowserConfig
 from crawl4ai.async_configs import CacheMode
 import json
 import base64
+import aiofiles
 
+try:
+    import orjson
+except ImportError:  # orjson is an optional speed-up, fall back to stdlib json
+    orjson = None
 
-async def crawl_full(url: str, filename: str):
+
+def dump_json(data):
+    """Serialize data to pretty-printed JSON bytes."""
+    if orjson:
+        # orjson serializes straight to UTF-8 bytes
+        return orjson.dumps(data, option=orjson.OPT_INDENT_2)
+    # Image and link dumps are URL strings, which are ASCII in practice; ensure_ascii=True
+    # keeps stdlib json on its C-accelerated ASCII encoder
+    return json.dumps(data, indent=2, ensure_ascii=True).encode("ascii")
+
+
+async def write_file(path, data, mode="w"):
+    """Write data without blocking the event loop."""
+    encoding = None if "b" in mode else "utf-8"
+    async with aiofiles.open(path, mode, encoding=encoding) as f:
+        await f.write(data)
+
+
+async def crawl_full(url: str, filename: str, pdf: bool = False, mhtml: bool = False,
+                     screenshot: bool = False, wait_images: bool = False):
     folder_path = "result_full"
     js_manage_url = """
     """
@@ -21,52 +45,57 @@ async def crawl_full(url: str, filename: str):
         wait_until="domcontentloaded",
         verbose=True,
         page_timeout=120000,
-        wait_for_images=True, 
-        screenshot=True, 
-        pdf=True,
-        capture_mhtml=True
+        # Each of these costs extra browser work, so they are only on when asked for
+        wait_for_images=wait_images, 
+        screenshot=screenshot, 
+        pdf=pdf,
+        capture_mhtml=mhtml
     )
     async with AsyncWebCrawler() as crawler: 
         result = await crawler.arun(url=url, config=config1)
         if result.success: 
             print("Result is successfully scraped")
-            with open(file_path, "w", encoding="utf-8") as f: 
-                f.write(result.markdown)
-            print(f"[+] Saved markdown to: {filename} folder")
-
             html_path = os.path.join(full_folder, f"{filename}_html.html")
-            with open(html_path, "w") as f: 
-                f.write(result.html)
-            print(f"Saved html to {html_path}")
 
             images = result.media.get("images", [])
             img_path = os.path.join(full_folder, f"{filename}_imgs.json")
-            with open(img_path, "w") as f: 
-                json.dump(images, f, indent=2)
-            print(f"{len(images)} images saved to {img_path}")
             # non images media?
 
             internal_links = result.links.get("internal", [])
             external_links = result.links.get("external", [])
             link_path = os.path.join(full_folder, f"{filename}_links.json")
-            with open(link_path, "w") as f: 
-                json.dump(
-                    {'internal': internal_links, 'external': external_links},
-                    f,
-                    indent=2
-                )
-            print(f"Found {len(internal_links)} internal and {len(external_links)} external links")
-            print(f"Links saved to {link_path}")
-            
-            shot_path = os.path.join(full_folder, f"{filename}_screenshot.png")
-            with open(shot_path, "wb") as f: 
-                f.write(base64.b64decode(result.screenshot))
-            print(f"Screenshot saved to {shot_path}")
 
+            shot_path = os.path.join(full_folder, f"{filename}_screenshot.png")
             mhtml_path = os.path.join(full_folder, f"{filename}_mhtml.mhtml")
-            with open(mhtml_path, "w", encoding="utf-8") as f: 
-                f.write(result.mhtml)
-            print(f"MHTML saved to {mhtml_path}")
+            pdf_path = os.path.join(full_folder, f"{filename}_pdf.pdf")
+
+            writes = [
+                write_file(file_path, result.markdown),
+                write_file(html_path, result.html),
+                write_file(img_path, dump_json(images), "wb"),
+                write_file(link_path, dump_json({'internal': internal_links, 'external': external_links}), "wb"),
+            ]
+            if screenshot:
+                writes.append(write_file(shot_path, base64.b64decode(result.screenshot), "wb"))
+            if mhtml:
+                writes.append(write_file(mhtml_path, result.mhtml))
+            if pdf:
+                writes.append(write_file(pdf_path, result.pdf, "wb"))
+
+            # All outputs are independent, so write them concurrently
+            await asyncio.gather(*writes)
+
+            print(f"[+] Saved markdown to: {filename} folder")
+            print(f"Saved html to {html_path}")
+            print(f"{len(images)} images saved to {img_path}")
+            print(f"Found {len(internal_links)} internal and {len(external_links)} external links")
+            print(f"Links saved to {link_path}")
+            if screenshot:
+                print(f"Screenshot saved to {shot_path}")
+            if mhtml:
+                print(f"MHTML saved to {mhtml_path}")
+            if pdf:
+                print(f"PDF saved to {pdf_path}")
 
 
 
@@ -74,9 +103,14 @@ if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Crawl a url and save the full result across multiple files")
     parser.add_argument("--url", required=True, help="URL of the webpage to be scraped")
     parser.add_argument("--filename", required=True, help="Name of the folder in output where the full result should be stored")
+    parser.add_argument("--pdf", action="store_true", help="Also render and save a PDF of the page")
+    parser.add_argument("--mhtml", action="store_true", help="Also capture and save an MHTML snapshot of the page")
+    parser.add_argument("--screenshot", action="store_true", help="Also capture and save a screenshot of the page")
+    parser.add_argument("--wait-images", action="store_true", help="Wait for all images to load before capturing")
     args = parser.parse_args()
 
-    asyncio.run(crawl_full(args.url, args.filename))
+    asyncio.run(crawl_full(args.url, args.filename, pdf=args.pdf, mhtml=args.mhtml,
+                           screenshot=args.screenshot, wait_images=args.wait_images))
 
 
 
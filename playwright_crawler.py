@@ -1,114 +1,547 @@
 import os
+import re
 import time
 import json
-import random
-from urllib.parse import urlparse, urljoin
-from collections import deque
-from playwright.sync_api import sync_playwright
+import hashlib
+import functools
+import asyncio
+from collections import defaultdict
+from urllib.parse import urlparse, urljoin, urlsplit
+import httpx
+from lxml import etree, html as lxml_html
+from playwright.async_api import async_playwright, TimeoutError as PlaywrightTimeout
+
+try:
+    import orjson
+except ImportError:  # orjson is an optional speed-up, fall back to stdlib json
+    orjson = None
+
+try:
+    import zstandard as zstd
+except ImportError:  # zstandard is only needed when COMPRESS_JSON is on
+    zstd = None
 
 # -------------------------------
 # CONFIG
 # -------------------------------
 START_URL = "https://www.pymc-labs.com/blog-posts/2022-10-26-AlvaLabs"   # <-- change this to your target site
 MAX_PAGES = 50                     # safety limit to avoid infinite crawling
-DELAY_RANGE = (1.5, 3.0)           # polite random delay between page loads
+RATE_PER_HOST = 1.0                # polite request rate per host (requests per second)
+BURST_PER_HOST = 2                 # requests a host may receive back-to-back
+MAX_CONCURRENCY = 5                # pages fetched in parallel
+MAX_PER_HOST = 2                   # pages fetched in parallel from any single host
+HTTP_TIMEOUT = 10                  # seconds for the plain-HTTP fast path
+MIN_STATIC_ANCHORS = 3             # fewer links than this suggests a JS-rendered page
+BLOCKED_RESOURCE_TYPES = {"image", "font", "media", "stylesheet"}  # not needed for text and links
+TRACKER_URL_PATTERN = re.compile(r"(doubleclick\.net|googlesyndication\.com|pubmatic\.com)")
+CACHE_DIR = "cache"                # fetched pages, revalidated with ETag / Last-Modified on reruns
+RENDER_IDLE_TIMEOUT = 3000         # ms to let a JS-rendered page settle after "load"
+COMPRESS_JSON = False              # write processed/<domain>.json.zst (needs zstandard) instead of .json
 
 # -------------------------------
 # HELPER FUNCTIONS
 # -------------------------------
 
+@functools.lru_cache(maxsize=1024)
+def _ensure_dir(path):
+    """Create a directory once per run; repeat calls for the same path are free."""
+    os.makedirs(path, exist_ok=True)
+
+
+def _write_bytes(path, data):
+    """Write a small payload with raw os.open/os.write, skipping the buffered file layer."""
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+    try:
+        view = memoryview(data)
+        while view:
+            view = view[os.write(fd, view):]
+    finally:
+        os.close(fd)
+
+
+def text_file_name(url):
+    """Fixed-length file name for a page: 16 hex chars of the URL's blake2b digest."""
+    return hashlib.blake2b(url.encode("utf-8"), digest_size=8).hexdigest()
+
+
+def save_text_index(domain, urls):
+    """Merge digest -> URL entries into text/<domain>/index.json"""
+    _ensure_dir(f"text/{domain}")
+    index_path = f"text/{domain}/index.json"
+    try:
+        with open(index_path, "rb") as f:
+            index = json.loads(f.read())
+    except (OSError, ValueError):
+        index = {}
+    index.update({text_file_name(url): url for url in urls})
+
+    if orjson:
+        payload = orjson.dumps(index, option=orjson.OPT_INDENT_2)
+    else:
+        payload = json.dumps(index, indent=2, ensure_ascii=False).encode("utf-8")
+    _write_bytes(index_path, payload)
+    return index_path
+
+
 def save_text(domain, url, text):
-    """Save text of a page into text/<domain>/<page>.txt"""
-    safe_name = url.replace("https://", "").replace("http://", "").replace("/", "_")
-    os.makedirs(f"text/{domain}", exist_ok=True)
-    with open(f"text/{domain}/{safe_name}.txt", "w", encoding="utf-8") as f:
-        f.write(text)
+    """Save text of a page into text/<domain>/<digest>.txt (see save_text_index)"""
+    _ensure_dir(f"text/{domain}")
+    _write_bytes(f"text/{domain}/{text_file_name(url)}.txt", text.encode("utf-8"))
 
 
-def save_json(domain, data):
-    """Save all collected data to processed/<domain>.json"""
-    os.makedirs("processed", exist_ok=True)
+def save_json(domain, data, compress=COMPRESS_JSON):
+    """Save all collected data to processed/<domain>.json, or .json.zst when compress is set"""
+    _ensure_dir("processed")
+    if compress:
+        # Full page texts compress 3-5x, and zstd level 3 is cheaper than writing the raw JSON
+        json_path = f"processed/{domain}.json.zst"
+        raw = orjson.dumps(data) if orjson else json.dumps(data, ensure_ascii=False).encode("utf-8")
+        with open(json_path, "wb") as f:
+            f.write(zstd.ZstdCompressor(level=3, threads=-1).compress(raw))
+        return json_path
+
     json_path = f"processed/{domain}.json"
+    if orjson:
+        # orjson writes UTF-8 bytes directly, same layout as the stdlib call below
+        with open(json_path, "wb") as f:
+            f.write(orjson.dumps(data, option=orjson.OPT_INDENT_2))
+        return json_path
     with open(json_path, "w", encoding="utf-8") as f:
         json.dump(data, f, indent=2, ensure_ascii=False)
+    return json_path
+
+
+# Collects internal links in the page itself: a.href is already absolute,
+# a.host is compared to the crawled host and fragments are dropped
+INTERNAL_LINKS_JS = """
+(localHost) => {
+    const links = new Set();
+    for (const a of document.querySelectorAll('a[href]')) {
+        // empty and fragment-only hrefs point back at this page
+        const target = a.getAttribute('href').split('#')[0].trim();
+        if (target && a.host === localHost) {
+            links.add(a.href.split('#')[0]);
+        }
+    }
+    return Array.from(links);
+}
+"""
 
 
-def extract_links(page, base_url, local_domain):
+async def extract_links(page, local_domain):
     """Extract and clean internal links from the page."""
-    anchors = page.query_selector_all("a[href]")
+    return await page.evaluate(INTERNAL_LINKS_JS, local_domain)
+
+
+SKIPPED_HREF_SCHEMES = ("mailto:", "javascript:", "tel:")
+
+
+def extract_links_from_html(tree, base_url, local_domain):
+    """Same as extract_links, for a page parsed with lxml."""
+    base = urlsplit(base_url)
+    origin = f"{base.scheme}://{base.netloc}"
+    same_host = base.netloc == local_domain
     links = set()
-    for a in anchors:
-        href = a.get_attribute("href")
-        if not href:
+    for href in tree.xpath("//a/@href"):
+        if href.startswith(SKIPPED_HREF_SCHEMES):
+            continue
+        target = href.split("#")[0]  # remove fragments
+        if not target.strip():
+            # empty and fragment-only hrefs point back at this page
             continue
+        # Root-relative and same-origin hrefs need no urljoin; dot segments and
+        # empty queries still go through it so they are normalized the same way
+        if same_host and "/." not in target and not target.endswith("?"):
+            if target.startswith(origin) and target[len(origin):len(origin) + 1] in ("", "/", "?"):
+                links.add(target)
+                continue
+            if target.startswith("/") and not target.startswith("//"):
+                links.add(origin + target)
+                continue
         abs_url = urljoin(base_url, href)
-        parsed = urlparse(abs_url)
-        if parsed.netloc == local_domain:
-            links.add(abs_url.split("#")[0])  # remove fragments
+        if urlsplit(abs_url).netloc == local_domain:
+            links.add(abs_url.split("#")[0])
     return list(links)
 
 
+# Elements that start a new line when rendered; text on either side of them is
+# separated, while inline tags (<b>, <a>, <sub>, ...) join their text as-is
+BLOCK_TAGS = frozenset({
+    "address", "article", "aside", "blockquote", "br", "dd", "div", "dl", "dt",
+    "fieldset", "figcaption", "figure", "footer", "form", "h1", "h2", "h3", "h4",
+    "h5", "h6", "header", "hr", "li", "main", "nav", "ol", "p", "pre", "section",
+    "table", "tbody", "td", "tfoot", "th", "thead", "tr", "ul",
+})
+
+
+def element_text(el):
+    """Visible text of an lxml element, roughly like innerText.
+
+    Block-level and <br> boundaries become a space, inline tags add nothing,
+    and runs of whitespace collapse to one space.
+    """
+    parts = []
+    # Explicit stack instead of recursion, so deeply nested pages can't hit the limit.
+    # A string on the stack is a tail or separator to emit once the subtree is done
+    stack = [el]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, str):
+            parts.append(node)
+            continue
+        if node is not el and node.tail:
+            stack.append(node.tail)
+        if not isinstance(node.tag, str):  # comments and PIs are not text
+            continue
+        block = node.tag in BLOCK_TAGS
+        if block:
+            parts.append(" ")
+            stack.append(" ")
+        if node.text:
+            parts.append(node.text)
+        stack.extend(reversed(node))
+    return " ".join("".join(parts).split())
+
+
+def body_text_from_html(tree):
+    """Text of the <body> of a page parsed with lxml."""
+    body = tree.find("body")
+    return element_text(body) if body is not None else ""
+
+
+def parse_rendered_html(html, base_url, local_domain):
+    """
+    Body text and internal links from a rendered page's HTML, parsed with lxml.
+    Runs in a worker thread; returns None if the HTML cannot be parsed.
+    """
+    try:
+        tree = lxml_html.document_fromstring(html)
+    except (etree.ParserError, ValueError):
+        return None
+    for el in tree.xpath("//script | //style | //noscript"):
+        el.drop_tree()
+    return body_text_from_html(tree), extract_links_from_html(tree, base_url, local_domain)
+
+
+def parse_static_html(content, encoding, base_url, local_domain):
+    """
+    Body text and internal links from HTML fetched over plain HTTP. Runs in a
+    worker thread; returns None when the page needs a browser instead.
+    """
+    # Decode with the charset from the Content-Type header when there is one;
+    # otherwise lxml falls back to the page's <meta charset>
+    try:
+        parser = lxml_html.HTMLParser(encoding=encoding) if encoding else None
+        tree = lxml_html.document_fromstring(content, parser=parser)
+    except (etree.ParserError, ValueError, LookupError):
+        return None
+
+    # A JS shell has few links and no paragraph text; let the browser render it
+    if len(tree.xpath("//a[@href]")) < MIN_STATIC_ANCHORS:
+        return None
+    if not any(p.text_content().strip() for p in tree.xpath("//p")):
+        return None
+
+    # Script and style bodies are not visible text
+    for el in tree.xpath("//script | //style | //noscript"):
+        el.drop_tree()
+    return body_text_from_html(tree), extract_links_from_html(tree, base_url, local_domain)
+
+
+async def fetch_static(client, url, local_domain):
+    """
+    Fetch a page over plain HTTP. Returns (text, links, headers) when the HTML
+    already carries the content, or None when the page needs a browser.
+    """
+    try:
+        response = await client.get(url, timeout=HTTP_TIMEOUT, follow_redirects=True)
+    except httpx.HTTPError:
+        return None
+    if response.status_code != 200 or "html" not in response.headers.get("content-type", ""):
+        return None
+
+    # Parse off the event loop, like rendered pages, so other fetches keep going
+    loop = asyncio.get_running_loop()
+    parsed = await loop.run_in_executor(
+        None, parse_static_html, response.content, response.charset_encoding, str(response.url), local_domain
+    )
+    if parsed is None:
+        return None
+    text, links = parsed
+    return text, links, response.headers
+
+
+async def _block_heavy_requests(route):
+    """Aborts heavy resources and tracker requests and lets everything else through."""
+    request = route.request
+    if request.resource_type in BLOCKED_RESOURCE_TYPES or TRACKER_URL_PATTERN.search(request.url):
+        await route.abort()
+    else:
+        await route.continue_()
+
+
+class TokenBucket:
+    """Allows `rate` requests per second on average, with bursts of up to `capacity`."""
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self.lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class LazyPagePool:
+    """
+    Pool of warm pages on one browser, launched on the first get(). Crawls served
+    entirely by the cache and the HTTP fast path never pay for starting Chromium.
+    """
+
+    def __init__(self, size):
+        self.size = size
+        self._pages = None
+        self._launch_lock = asyncio.Lock()
+        self._playwright = None
+        self._browser = None
+
+    async def _launch(self):
+        self._playwright = await async_playwright().start()
+        self._browser = await self._playwright.chromium.launch(headless=True)
+        context = await self._browser.new_context()
+        await context.route("**/*", _block_heavy_requests)
+
+        # Warm pages are reused across URLs instead of opening one per visit
+        pages = asyncio.Queue()
+        for _ in range(self.size):
+            pages.put_nowait(await context.new_page())
+        self._pages = pages
+
+    async def get(self):
+        if self._pages is None:
+            async with self._launch_lock:
+                if self._pages is None:
+                    await self._launch()
+        return await self._pages.get()
+
+    def put_nowait(self, page):
+        self._pages.put_nowait(page)
+
+    async def close(self):
+        if self._browser is not None:
+            await self._browser.close()
+        if self._playwright is not None:
+            await self._playwright.stop()
+
+
+async def release_page(page_pool, page):
+    """Blank a pooled page and hand it back for the next URL."""
+    try:
+        await page.goto("about:blank")
+    except Exception:
+        pass
+    page_pool.put_nowait(page)
+
+
+async def playwright_fetch(page_pool, url, local_domain):
+    """Render a page in the browser and return its body text, internal links and response headers."""
+    page = await page_pool.get()
+    try:
+        # Only pages the static fetch judged JS-rendered get here, so let scripts run:
+        # wait for "load" (cheap with heavy resources blocked), then briefly for the
+        # network to go quiet so client-side rendering can finish
+        response = await page.goto(url, wait_until="load", timeout=15000)
+        headers = response.headers if response else {}
+        try:
+            await page.wait_for_load_state("networkidle", timeout=RENDER_IDLE_TIMEOUT)
+        except PlaywrightTimeout:
+            pass
+
+        # OPTIONAL: auto-accept cookie banners
+        for selector in ['button:has-text("Accept")', 'button:has-text("OK")']:
+            try:
+                if await page.locator(selector).is_visible():
+                    await page.click(selector)
+                    print("✅ Accepted cookies banner.")
+                    break
+            except Exception:
+                pass
+
+        # Take the rendered HTML in one round-trip and parse it off the event loop,
+        # so Chromium does no text layout and other pages keep loading meanwhile
+        html = await page.content()
+        loop = asyncio.get_running_loop()
+        parsed = await loop.run_in_executor(None, parse_rendered_html, html, page.url, local_domain)
+        if parsed is not None:
+            text, links = parsed
+        else:
+            text = await page.inner_text("body")
+            links = await extract_links(page, local_domain)
+    finally:
+        await release_page(page_pool, page)
+    return text, links, headers
+
+
+async def fetch(client, page_pool, url, local_domain):
+    """Try the plain-HTTP fast path first and fall back to Playwright."""
+    fetched = await fetch_static(client, url, local_domain)
+    if fetched is None:
+        return await playwright_fetch(page_pool, url, local_domain)
+    return fetched
+
+
+def cache_path(domain, url):
+    """Cache file for a URL: cache/<domain>/<sha1 of url>.json"""
+    return os.path.join(CACHE_DIR, domain, hashlib.sha1(url.encode("utf-8")).hexdigest() + ".json")
+
+
+def load_cached(domain, url):
+    """Return the cached entry for a URL, or None if it was never fetched."""
+    try:
+        with open(cache_path(domain, url), "rb") as f:
+            raw = f.read()
+        return orjson.loads(raw) if orjson else json.loads(raw)
+    except (OSError, ValueError):
+        return None
+
+
+def store_cached(domain, url, entry):
+    """Store a fetched page so the next run can revalidate instead of re-rendering."""
+    _ensure_dir(os.path.join(CACHE_DIR, domain))
+    if orjson:
+        payload = orjson.dumps(entry)
+    else:
+        payload = json.dumps(entry, ensure_ascii=False).encode("utf-8")
+    _write_bytes(cache_path(domain, url), payload)
+
+
+async def cached_fetch(client, page_pool, url, local_domain):
+    """
+    Reuse the cached text and links when the server answers a conditional
+    HEAD with 304 Not Modified; otherwise fetch the page and cache it.
+    """
+    cached = load_cached(local_domain, url)
+    if cached:
+        validators = {}
+        if cached.get("etag"):
+            validators["If-None-Match"] = cached["etag"]
+        if cached.get("last_modified"):
+            validators["If-Modified-Since"] = cached["last_modified"]
+        if validators:
+            try:
+                head = await client.head(url, headers=validators, timeout=HTTP_TIMEOUT)
+                if head.status_code == 304:
+                    print(f"💾 Unchanged since last crawl: {url}")
+                    return cached["text"], cached["links"]
+            except httpx.HTTPError:
+                pass
+
+    text, links, headers = await fetch(client, page_pool, url, local_domain)
+    store_cached(local_domain, url, {
+        "url": url,
+        "etag": headers.get("etag"),
+        "last_modified": headers.get("last-modified"),
+        "text": text,
+        "links": links,
+    })
+    return text, links
+
+
 # -------------------------------
 # MAIN CRAWLER FUNCTION
 # -------------------------------
 
-def playwright_crawl(start_url):
+async def _playwright_crawl(start_url, max_concurrency=MAX_CONCURRENCY):
+    # Fail before crawling rather than after, when the results are about to be written
+    if COMPRESS_JSON and zstd is None:
+        raise RuntimeError("COMPRESS_JSON is set but the zstandard package is not installed")
     local_domain = urlparse(start_url).netloc
     seen = set([start_url])
-    queue = deque([start_url])
+    queue = asyncio.Queue()
+    queue.put_nowait(start_url)
     results = {}
+    claimed = 0  # pages being visited or saved, so MAX_PAGES holds across workers
+    host_buckets = defaultdict(lambda: TokenBucket(RATE_PER_HOST, BURST_PER_HOST))
+    host_semaphores = defaultdict(lambda: asyncio.Semaphore(MAX_PER_HOST))
+    fingerprints = set()  # sha1 of each saved page's full text
 
-    with sync_playwright() as p:
-        browser = p.chromium.launch(headless=True)
-        context = browser.new_context()
-
+    # Chromium starts only when a page misses the cache and the HTTP fast path
+    page_pool = LazyPagePool(max_concurrency)
+    try:
         print(f"🌐 Starting crawl on: {start_url}")
-        page = context.new_page()
-
-        while queue and len(results) < MAX_PAGES:
-            url = queue.popleft()
-            print(f"[{len(results)+1}] Visiting: {url}")
 
-            try:
-                page.goto(url, wait_until="networkidle", timeout=30000)
+        async def worker():
+            nonlocal claimed
+            while True:
+                url = await queue.get()
+                try:
+                    if claimed >= MAX_PAGES:
+                        continue
+                    claimed += 1
+                    print(f"[{claimed}] Visiting: {url}")
 
-                # OPTIONAL: auto-accept cookie banners
-                for selector in ['button:has-text("Accept")', 'button:has-text("OK")']:
                     try:
-                        if page.locator(selector).is_visible():
-                            page.click(selector)
-                            print("✅ Accepted cookies banner.")
-                            break
-                    except Exception:
-                        pass
-
-                # Extract text
-                text = page.inner_text("body")
-                results[url] = text
-                save_text(local_domain, url, text)
-
-                # Extract internal links
-                links = extract_links(page, url, local_domain)
-                for link in links:
-                    if link not in seen:
-                        seen.add(link)
-                        queue.append(link)
-
-                # Polite delay
-                sleep_time = random.uniform(*DELAY_RANGE)
-                print(f"🕒 Sleeping {sleep_time:.2f}s...")
-                time.sleep(sleep_time)
-
-            except Exception as e:
-                print(f"⚠️ Error visiting {url}: {e}")
-
-        browser.close()
+                        # Polite per-host limits: request rate and requests in flight
+                        host = urlparse(url).netloc
+                        async with host_semaphores[host]:
+                            await host_buckets[host].acquire()
+
+                            # Extract text and internal links
+                            text, links = await cached_fetch(client, page_pool, url, local_domain)
+
+                        # Links are followed even from duplicate pages below
+                        for link in links:
+                            if link not in seen:
+                                seen.add(link)
+                                queue.put_nowait(link)
+
+                        # Pages with exactly the same text (e.g. the same article under
+                        # several URLs) are duplicates; keep the first
+                        fingerprint = hashlib.sha1(text.encode("utf-8")).hexdigest()
+                        if fingerprint in fingerprints:
+                            claimed -= 1
+                            print(f"♻️ Skipping duplicate page: {url}")
+                            continue
+                        fingerprints.add(fingerprint)
+
+                        results[url] = text
+                        save_text(local_domain, url, text)
+
+                    except Exception as e:
+                        claimed -= 1
+                        print(f"⚠️ Error visiting {url}: {e}")
+                finally:
+                    queue.task_done()
+
+        async with httpx.AsyncClient(http2=True) as client:
+            workers = [asyncio.create_task(worker()) for _ in range(max_concurrency)]
+            await queue.join()
+            for task in workers:
+                task.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+    finally:
+        await page_pool.close()
 
     # Save results
-    save_json(local_domain, results)
+    json_path = save_json(local_domain, results)
+    save_text_index(local_domain, results)
     print(f"\n✅ Crawl complete! {len(results)} pages saved.")
-    print(f"📁 Text files: text/{local_domain}/")
-    print(f"📄 JSON file: processed/{local_domain}.json")
+    print(f"📁 Text files: text/{local_domain}/ (index.json maps file names to URLs)")
+    print(f"📄 JSON file: {json_path}")
+
+
+def playwright_crawl(start_url):
+    asyncio.run(_playwright_crawl(start_url))
 
 
 # -------------------------------
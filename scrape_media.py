@@ -1,238 +1,295 @@
 #!/usr/bin/env python3
 import os
 import re
+import glob
 import json
+import shutil
+import tempfile
 import hashlib
 import argparse
+import asyncio
 import mimetypes
-from urllib.parse import urlparse, urljoin
+from urllib.parse import urlparse, urljoin, urlunparse, parse_qsl, urlencode, unquote_to_bytes
 from base64 import b64decode
 
 import requests
-from playwright.sync_api import sync_playwright, TimeoutError as PlaywrightTimeout
+from requests.adapters import HTTPAdapter
+from playwright.async_api import async_playwright, TimeoutError as PlaywrightTimeout
+
+try:
+    import orjson
+except ImportError:  # orjson is an optional speed-up, fall back to stdlib json
+    orjson = None
 
 # -------------------------------
 # CONFIG
 # -------------------------------
 TIMEOUT = 30000  # 30s navigation timeout (adjust as needed)
 WAIT_STRATEGIES = ["domcontentloaded", "load"]
+MAX_DOWNLOAD_WORKERS = 16  # media files downloaded concurrently
+HTTP_POOL_SIZE = 32        # pooled keep-alive connections per host, above the worker count
+DOWNLOAD_CHUNK_SIZE = 1024 * 1024  # 1 MiB copy buffer for streamed downloads
+BLOCKED_RESOURCE_TYPES = {"image", "media", "font"}  # fetched out-of-band by the downloader instead
+USER_AGENT = (  # shared by the browser context and the download session
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
+    "AppleWebKit/537.36 (KHTML, like Gecko) "
+    "Chrome/120.0.0.0 Safari/537.36"
+)
+CSS_CACHE_DIR = os.path.expanduser("~/.cache/apex_scraper/css")  # url(...) lists per stylesheet, across runs
+
+# Compiled once at import: url(...) references in CSS, and unsafe file name characters
+_URL_RE = re.compile(r'url\((?:["\']?)(.*?)(?:["\']?)\)')
+_SAFE_NAME_RE = re.compile(r'[^A-Za-z0-9._-]')
+# Query parameters that only track the visit and never change the asset served
+_TRACKING_PARAM_RE = re.compile(r'^(utm_\w+|fbclid|gclid|dclid|msclkid|mc_cid|mc_eid|_ga|_gl|ref_src)$', re.I)
 
 
 # -------------------------------
 # HELPERS - Content extraction
 # -------------------------------
-def extract_content_hierarchy(page):
+# Builds the header -> text structure inside the page, in a single round-trip
+CONTENT_HIERARCHY_JS = """
+() => {
+    const headers = Array.from(document.querySelectorAll('h1, h2, h3, h4, h5, h6'));
+
+    if (!headers.length) {
+        // fallback to paragraphs as a single "Page" section
+        const text = Array.from(document.querySelectorAll('p'))
+            .map(p => p.innerText.trim())
+            .filter(Boolean)
+            .join(' ');
+        return [{ header: 'Page', text }];
+    }
+
+    return headers.map((header, i) => {
+        const headerText = (header.innerText || '').trim() || `Section ${i + 1}`;
+        const paragraphs = [];
+        // collect <p> siblings until the next element whose tag starts with "h"
+        for (let sibling = header.nextElementSibling; sibling; sibling = sibling.nextElementSibling) {
+            const tag = sibling.tagName ? sibling.tagName.toLowerCase() : null;
+            if (!tag || tag.startsWith('h')) break;
+            if (tag === 'p') {
+                const paraText = (sibling.innerText || '').trim();
+                if (paraText) paragraphs.push(paraText);
+            }
+        }
+        return { header: headerText, text: paragraphs.join(' ') };
+    });
+}
+"""
+
+
+async def extract_content_hierarchy(page):
     """Return header->text list structure (simplified)"""
-    content = []
-    headers = page.query_selector_all("h1, h2, h3, h4, h5, h6")
-
-    if not headers:
-        # fallback to paragraphs as a single "Page" section
-        paragraphs = page.query_selector_all("p")
-        text = " ".join([p.inner_text().strip() for p in paragraphs if p.inner_text().strip()])
-        return [{"header": "Page", "text": text}]
-
-    for i, header in enumerate(headers):
-        try:
-            header_text = header.inner_text().strip() or f"Section {i+1}"
-        except Exception:
-            header_text = f"Section {i+1}"
-
-        paragraphs = []
-        try:
-            sibling = header.evaluate_handle("el => el.nextElementSibling")
-            while sibling:
-                # avoid errors if the element was detached
-                try:
-                    tag = sibling.evaluate("el => el.tagName ? el.tagName.toLowerCase() : null")
-                except Exception:
-                    break
-                if not tag:
-                    break
-                if tag.startswith("h"):
-                    break
-                if tag == "p":
-                    try:
-                        para_text = sibling.evaluate("el => el.innerText").strip()
-                        if para_text:
-                            paragraphs.append(para_text)
-                    except Exception:
-                        pass
-                # move to next sibling
-                try:
-                    sibling = sibling.evaluate_handle("el => el.nextElementSibling")
-                except Exception:
-                    break
-        except Exception:
-            # on any JS handle issues, ignore and continue
-            pass
-
-        combined_text = " ".join(paragraphs)
-        content.append({"header": header_text, "text": combined_text})
-
-    return content
+    return await page.evaluate(CONTENT_HIERARCHY_JS)
 
 
 # -------------------------------
 # HELPERS - Media extraction
 # -------------------------------
-def collect_media_urls(page, base_url):
+# Elements checked for background images: anything with an inline url(...)
+# plus the tags that typically carry a CSS background. Walking every element
+# with getComputedStyle forces style recalculation across the whole DOM.
+BACKGROUND_SELECTOR = (
+    '[style*="url("], header, section, div, span, a, button, li, figure, aside, main'
+)
+
+# Gathers every raw media reference in the page, in a single round-trip.
+# Each source is guarded on its own so one failure doesn't lose the rest.
+MEDIA_URLS_JS = r"""
+(BACKGROUND_SELECTOR) => {
+    const urls = [];
+    const css = [];
+    const urlRe = /url\((?:["']?)(.*?)(?:["']?)\)/g;
+    const addCssUrls = (text) => {
+        if (!text) return;
+        for (const m of text.matchAll(urlRe)) {
+            if (m[1]) urls.push(m[1]);
+        }
+    };
+
+    // 1) Standard attributes (img, video, audio, source, link[rel~=icon], meta og:image)
+    try {
+        for (const img of document.querySelectorAll('img')) {
+            const src = img.getAttribute('src');
+            if (src) urls.push(src);
+            const srcset = img.getAttribute('srcset');
+            if (srcset) {
+                // srcset contains comma separated entries "url 1x, url2 2x"
+                for (const part of srcset.split(',')) {
+                    const urlPart = part.trim().split(/\s+/)[0];
+                    if (urlPart) urls.push(urlPart);
+                }
+            }
+        }
+    } catch (e) {}
+
+    // video/audio/source/picture
+    try {
+        for (const n of document.querySelectorAll('video, audio, source, picture, iframe')) {
+            const src = n.getAttribute('src');
+            if (src) urls.push(src);
+            const src2 = n.getAttribute('data-src') || n.getAttribute('data-srcset');
+            if (src2) urls.push(src2);
+        }
+    } catch (e) {}
+
+    // link rel icons / images, and the stylesheets to scan, in one pass
+    try {
+        for (const l of document.querySelectorAll('link[rel]')) {
+            const rel = (l.getAttribute('rel') || '').toLowerCase();
+            const href = l.getAttribute('href');
+            if (!href) continue;
+            if (rel.includes('icon') || rel.includes('image')) urls.push(href);
+            if (rel === 'stylesheet') css.push(href);
+        }
+    } catch (e) {}
+
+    // meta og:image
+    try {
+        for (const m of document.querySelectorAll("meta[property='og:image'], meta[name='og:image']")) {
+            const content = m.getAttribute('content');
+            if (content) urls.push(content);
+        }
+    } catch (e) {}
+
+    // 2) Background images: inline style attributes are parsed directly, and
+    // computed style is only consulted for the tags that usually carry one
+    try {
+        for (const el of document.querySelectorAll(BACKGROUND_SELECTOR)) {
+            const inline = el.getAttribute('style');
+            if (inline && inline.includes('url(')) {
+                addCssUrls(inline);
+                continue;
+            }
+            try {
+                const style = window.getComputedStyle(el).getPropertyValue('background-image');
+                if (style && style !== 'none') addCssUrls(style);
+            } catch (e) {
+                // ignore
+            }
+        }
+    } catch (e) {}
+
+    // 3) Inline <style> blocks
+    try {
+        for (const s of document.querySelectorAll('style')) addCssUrls(s.textContent);
+    } catch (e) {}
+
+    return { urls, css };
+}
+"""
+
+
+async def collect_media_urls(page, base_url):
     """Collect candidate media URLs from many DOM/CSS sources on the page."""
-    urls = set()
-
-    # 1) Standard attributes (img, video, audio, source, link[rel~=icon], meta og:image)
     try:
-        imgs = page.query_selector_all("img")
-        for img in imgs:
-            try:
-                src = img.get_attribute("src")
-                if src:
-                    urls.add(urljoin(base_url, src))
-                srcset = img.get_attribute("srcset")
-                if srcset:
-                    # srcset contains comma separated entries "url 1x, url2 2x"
-                    for part in srcset.split(","):
-                        url_part = part.strip().split()[0]
-                        if url_part:
-                            urls.add(urljoin(base_url, url_part))
-            except Exception:
-                continue
+        found = await page.evaluate(MEDIA_URLS_JS, BACKGROUND_SELECTOR)
     except Exception:
-        pass
+        return set(), []
 
-    # video/audio/source/picture
-    try:
-        for sel in ["video", "audio", "source", "picture", "iframe"]:
-            nodes = page.query_selector_all(sel)
-            for n in nodes:
-                try:
-                    src = n.get_attribute("src")
-                    if src:
-                        urls.add(urljoin(base_url, src))
-                    # <source src="">
-                    src2 = n.get_attribute("data-src") or n.get_attribute("data-srcset")
-                    if src2:
-                        urls.add(urljoin(base_url, src2))
-                except Exception:
-                    continue
-    except Exception:
-        pass
+    urls = {urljoin(base_url, u) for u in found["urls"]}
+    css_hrefs = [urljoin(base_url, href) for href in found["css"]]
+    urls.update(css_hrefs)  # also include CSS itself
+    return urls, css_hrefs
 
-    # link rel icons / images
-    try:
-        links = page.query_selector_all("link[rel]")
-        for l in links:
-            try:
-                rel = (l.get_attribute("rel") or "").lower()
-                if "icon" in rel or "image" in rel:
-                    href = l.get_attribute("href")
-                    if href:
-                        urls.add(urljoin(base_url, href))
-            except Exception:
-                continue
-    except Exception:
-        pass
 
-    # meta og:image
-    try:
-        metas = page.query_selector_all("meta[property='og:image'], meta[name='og:image']")
-        for m in metas:
-            try:
-                content = m.get_attribute("content")
-                if content:
-                    urls.add(urljoin(base_url, content))
-            except Exception:
-                continue
-    except Exception:
-        pass
+def _css_cache_path(css_url):
+    return os.path.join(CSS_CACHE_DIR, hashlib.sha256(css_url.encode("utf-8")).hexdigest() + ".json")
 
-    # 2) Inline styles background-image via computed style
-    try:
-        background_candidates = page.evaluate(
-            """() => {
-                const out = [];
-                const all = Array.from(document.querySelectorAll('*'));
-                for (const el of all) {
-                    try {
-                        const style = window.getComputedStyle(el).getPropertyValue('background-image');
-                        if (style && style !== 'none') out.push(style);
-                    } catch (e) {
-                        // ignore
-                    }
-                }
-                return out;
-            }"""
-        )
-        for item in background_candidates:
-            # style like: url("..."), url('...'), linear-gradient(...), etc.
-            matches = re.findall(r'url\((?:["\']?)(.*?)(?:["\']?)\)', item)
-            for m in matches:
-                if m:
-                    urls.add(urljoin(base_url, m))
-    except Exception:
-        pass
 
-    # 3) CSS files referenced on the page - fetch href of <link rel="stylesheet"> and scan for url(...)
-    css_hrefs = []
-    try:
-        linksheets = page.query_selector_all("link[rel='stylesheet']")
-        for l in linksheets:
-            try:
-                href = l.get_attribute("href")
-                if href:
-                    href_abs = urljoin(base_url, href)
-                    css_hrefs.append(href_abs)
-                    urls.add(href_abs)  # also include CSS itself
-            except Exception:
-                continue
-    except Exception:
-        pass
+def fetch_css_urls(session, css_url):
+    """Return the absolute url(...) references in a stylesheet.
 
-    # 4) Parse inline <style> blocks for url(...)
+    The extracted list is cached on disk with the response's ETag/Last-Modified,
+    so on later runs the stylesheet is revalidated and a 304 skips the download
+    and the regex scan. Returns None if the stylesheet could not be fetched.
+    """
+    path = _css_cache_path(css_url)
+    cached = None
     try:
-        style_nodes = page.query_selector_all("style")
-        for s in style_nodes:
-            try:
-                txt = s.inner_text()
-                matches = re.findall(r'url\((?:["\']?)(.*?)(?:["\']?)\)', txt)
-                for m in matches:
-                    if m:
-                        urls.add(urljoin(base_url, m))
-            except Exception:
-                continue
-    except Exception:
+        with open(path, "r", encoding="utf-8") as f:
+            cached = json.load(f)
+    except (OSError, ValueError):
         pass
 
-    return urls, css_hrefs
+    headers = {}
+    if cached:
+        if cached.get("etag"):
+            headers["If-None-Match"] = cached["etag"]
+        if cached.get("last_modified"):
+            headers["If-Modified-Since"] = cached["last_modified"]
+
+    r = session.get(css_url, headers=headers, timeout=30)
+    if r.status_code == 304 and cached:
+        return cached.get("extracted_urls", [])
+    if r.status_code != 200:
+        print(f"⚠️ CSS fetch returned {r.status_code} for {css_url}")
+        return None
+
+    # search for url(...) patterns
+    extracted = [urljoin(css_url, m) for m in _URL_RE.findall(r.text) if m]
+
+    etag = r.headers.get("etag")
+    last_modified = r.headers.get("last-modified")
+    if etag or last_modified:
+        try:
+            os.makedirs(CSS_CACHE_DIR, exist_ok=True)
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump({"etag": etag, "last_modified": last_modified, "extracted_urls": extracted}, f)
+        except OSError:
+            pass
+    return extracted
+
+
+class _LimitedReader:
+    """File-like wrapper that stops reading after max_bytes."""
+
+    def __init__(self, raw, max_bytes):
+        self.raw = raw
+        self.remaining = max_bytes
+
+    def read(self, n=-1):
+        if self.remaining <= 0:
+            return b""
+        if n is None or n < 0 or n > self.remaining:
+            n = self.remaining
+        data = self.raw.read(n)
+        self.remaining -= len(data)
+        return data
 
 
 def download_with_requests(session, url, dest_path, max_bytes=None):
-    """Download resource via requests.Session (stream), save to dest_path."""
+    """Download resource via requests.Session (stream), save to dest_path.
+
+    Returns (ok, error, content_type). With max_bytes the server is asked for
+    just that many bytes via a Range header; the cap is also enforced locally
+    for servers that ignore it.
+    """
+    headers = {"Range": f"bytes=0-{max_bytes - 1}"} if max_bytes else None
     try:
-        with session.get(url, stream=True, timeout=60) as resp:
+        with session.get(url, headers=headers, stream=True, timeout=60) as resp:
             resp.raise_for_status()
-            total = 0
+            # read straight from the socket, letting urllib3 undo any gzip/br encoding
+            resp.raw.decode_content = True
+            src = _LimitedReader(resp.raw, max_bytes) if max_bytes else resp.raw
             with open(dest_path, "wb") as fw:
-                for chunk in resp.iter_content(chunk_size=65536):
-                    if chunk:
-                        fw.write(chunk)
-                        total += len(chunk)
-                        if max_bytes and total > max_bytes:
-                            # optional: allow stopping large downloads
-                            break
-        return True, None
+                # copy loop runs in 1 MiB blocks instead of per-chunk Python iterations
+                shutil.copyfileobj(src, fw, length=DOWNLOAD_CHUNK_SIZE)
+            return True, None, resp.headers.get("content-type")
     except Exception as e:
-        return False, str(e)
+        return False, str(e), None
 
 
 def save_data_uri(data_uri, dest_path):
-    """Decode data:... base64 URI and write to file"""
+    """Decode a data:... URI (base64 or percent-encoded) and write to file"""
     try:
-        header, b64 = data_uri.split(",", 1)
+        header, payload = data_uri.split(",", 1)
         if ";base64" in header:
-            raw = b64decode(b64)
+            raw = b64decode(payload)
         else:
-            raw = b64.encode("utf-8")
+            # plain data URIs are percent-encoded
+            raw = unquote_to_bytes(payload)
         with open(dest_path, "wb") as f:
             f.write(raw)
         return True, None
@@ -257,26 +314,118 @@ def guess_extension_from_url_or_type(url, content_type=None):
     return ""
 
 
+async def _block_media_requests(route):
+    """Aborts image/media/font requests during navigation and lets everything else through."""
+    if route.request.resource_type in BLOCKED_RESOURCE_TYPES:
+        await route.abort()
+    else:
+        await route.continue_()
+
+
+def _canon(url):
+    """Dedupe key for a media URL: no fragment, no tracking params, sorted query.
+
+    The query is otherwise kept, since resizers and signed CDN URLs put the asset
+    identity in it. Only the key is normalized; the original URL is downloaded.
+    """
+    if url.startswith("data:"):
+        return url
+    p = urlparse(url)
+    query = sorted((k, v) for k, v in parse_qsl(p.query, keep_blank_values=True) if not _TRACKING_PARAM_RE.match(k))
+    return urlunparse((p.scheme.lower(), p.netloc.lower(), p.path, p.params, urlencode(query), ""))
+
+
+def _media_name_stem(name_base, url_hash):
+    """
+    File name for an asset as far as its URL decides it: the hash, plus the
+    sanitized base name when the base has a dot. Returns (stem, complete);
+    when the URL path carries no extension, complete is False and the
+    response content-type supplies the suffix.
+    """
+    if "." not in name_base:
+        return url_hash, False
+    stem = f"{url_hash}_{_SAFE_NAME_RE.sub('_', name_base)}"
+    return stem, bool(os.path.splitext(name_base)[1])
+
+
+def _media_file_name(name_base, url_hash, content_type=None):
+    """Name a downloaded file by URL hash, keeping the sanitized base name when there is one."""
+    stem, complete = _media_name_stem(name_base, url_hash)
+    if complete:
+        return stem
+    return f"{stem}{guess_extension_from_url_or_type('', content_type) or '.bin'}"
+
+
+def _fetch_one(sess, start_url, media_dir, murl):
+    """Download one remote media URL into media_dir. Returns (murl, dest, error)."""
+    try:
+        abs_url = urljoin(start_url, murl)
+    except Exception:
+        abs_url = murl
+
+    # file base name from URL path, else use hash
+    name_base = os.path.basename(urlparse(abs_url).path) or ""
+    # name files by a hash of the URL, so the same asset always maps to the same file
+    h = hashlib.sha256(abs_url.encode("utf-8")).hexdigest()[:16]
+
+    # skip assets fetched by an earlier run. Without an extension in the URL the final
+    # name is the same stem plus a content-type suffix, so look for any such file
+    stem, complete = _media_name_stem(name_base, h)
+    if complete:
+        existing = os.path.join(media_dir, stem)
+        existing = [existing] if os.path.exists(existing) else []
+    else:
+        existing = glob.glob(glob.escape(os.path.join(media_dir, stem)) + ".*")
+        existing = [path for path in existing if not path.endswith(".part")]
+    if existing:
+        return murl, existing[0], None
+
+    # Download (stream) into a temporary name, so an interrupted download
+    # is never mistaken for a finished one on the next run. There is no HEAD
+    # preflight: the GET's own content-type picks the final extension
+    print(f"Downloading: {abs_url}")
+    # the temp name is unique, so pages gathered concurrently into the same
+    # media_dir can fetch the same asset without clobbering each other
+    fd, part = tempfile.mkstemp(dir=media_dir, prefix=f"{h}_", suffix=".part")
+    os.close(fd)
+    ok, err, content_type = download_with_requests(sess, abs_url, part)
+    if ok:
+        dest = os.path.join(media_dir, _media_file_name(name_base, h, content_type))
+        os.chmod(part, 0o644)  # mkstemp creates owner-only files
+        os.replace(part, dest)
+        print(f"Saved: {abs_url} -> {dest}")
+        return murl, dest, None
+    try:
+        os.remove(part)
+    except OSError:
+        pass
+    print(f"⚠️ Error downloading {abs_url}: {err}")
+    return murl, None, err
+
+
 # -------------------------------
 # MAIN - parse + collect + download
 # -------------------------------
-def parse_single_page_and_media(start_url, outfile, media_dir):
+async def parse_single_page_and_media(start_url, outfile, media_dir):
     parsed_base = urlparse(start_url)
     base_origin = f"{parsed_base.scheme}://{parsed_base.netloc}"
     os.makedirs(media_dir, exist_ok=True)
 
     results = {}
 
-    with sync_playwright() as p:
-        browser = p.chromium.launch(headless=True, args=["--no-sandbox", "--disable-dev-shm-usage", "--disable-gpu", "--disable-blink-features=AutomationControlled"])
-        context = browser.new_context(user_agent="Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36")
-        page = context.new_page()
+    async with async_playwright() as p:
+        browser = await p.chromium.launch(headless=True, args=["--no-sandbox", "--disable-dev-shm-usage", "--disable-gpu", "--disable-blink-features=AutomationControlled"])
+        context = await browser.new_context(user_agent=USER_AGENT)
+        page = await context.new_page()
+        # the browser doesn't need to download media the scraper fetches itself afterwards;
+        # stylesheets still load so computed background styles resolve
+        await page.route("**/*", _block_media_requests)
 
         # navigate with fallback wait strategies
         print(f"Visiting {start_url} ...")
         for wait_type in WAIT_STRATEGIES:
             try:
-                page.goto(start_url, wait_until=wait_type, timeout=TIMEOUT)
+                await page.goto(start_url, wait_until=wait_type, timeout=TIMEOUT)
                 break
             except PlaywrightTimeout:
                 print(f"⚠️ Timeout with wait='{wait_type}', trying next...")
@@ -284,27 +433,28 @@ def parse_single_page_and_media(start_url, outfile, media_dir):
             print("⚠️ All navigation strategies timed out — continuing with partial load.")
 
         # structured content
-        content = extract_content_hierarchy(page)
+        content = await extract_content_hierarchy(page)
         results["url"] = start_url
         results["domain"] = parsed_base.netloc
         results["content"] = content
 
         # collect media candidate URLs and linked CSS files
-        media_urls, css_hrefs = collect_media_urls(page, start_url)
+        media_urls, css_hrefs = await collect_media_urls(page, start_url)
         print(f"Found {len(media_urls)} media/CSS candidates on page and {len(css_hrefs)} CSS files to scan.")
 
         # prepare requests.Session using cookies from Playwright so protected resources can be fetched
         sess = requests.Session()
-        # Save user-agent string in a variable when creating the context
-        user_agent = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
-        context = browser.new_context(user_agent=user_agent)
-
-        # Later, set it explicitly in requests.Session
-        sess.headers.update({"User-Agent": user_agent})
+        # Keep enough pooled connections for every download thread, so each asset
+        # reuses an open TCP+TLS connection instead of handshaking again
+        adapter = HTTPAdapter(pool_connections=HTTP_POOL_SIZE, pool_maxsize=HTTP_POOL_SIZE, max_retries=2)
+        sess.mount("http://", adapter)
+        sess.mount("https://", adapter)
+        # same user agent as the browser context
+        sess.headers.update({"User-Agent": USER_AGENT})
 
         try:
-            # get cookies from context
-            cookies = context.cookies()
+            # get cookies from the context that loaded the page
+            cookies = await context.cookies()
             jar = requests.cookies.RequestsCookieJar()
             for c in cookies:
                 # convert Playwright cookie to requests cookie
@@ -317,29 +467,31 @@ def parse_single_page_and_media(start_url, outfile, media_dir):
         downloaded = {}
         errors = {}
 
-        # 1) First handle CSS files: fetch and parse url(...) to find assets referenced inside
-        for css_url in css_hrefs:
+        # 1) First handle CSS files: fetch and parse url(...) to find assets referenced inside.
+        # requests is blocking, so each fetch runs on a worker thread and they overlap
+        async def scan_css(css_url):
             try:
                 css_abs = urljoin(start_url, css_url)
                 print(f"Fetching CSS {css_abs} ...")
-                r = sess.get(css_abs, timeout=30)
-                if r.status_code == 200:
-                    # search for url(...) patterns
-                    matches = re.findall(r'url\((?:["\']?)(.*?)(?:["\']?)\)', r.text)
-                    for m in matches:
-                        if m:
-                            media_urls.add(urljoin(css_abs, m))
-                else:
-                    print(f"⚠️ CSS fetch returned {r.status_code} for {css_abs}")
+                return await asyncio.to_thread(fetch_css_urls, sess, css_abs)
             except Exception as e:
                 print(f"⚠️ CSS fetch error: {e}")
+                return None
+
+        for css_media in await asyncio.gather(*(scan_css(css_url) for css_url in css_hrefs)):
+            if css_media:
+                media_urls.update(css_media)
 
-        # 2) Iterate through media candidates and download
+        # 2) Iterate through media candidates: decode data URIs now, queue remote URLs
+        # dedupe once up front, treating URLs that differ only in fragment, tracking
+        # params or query order as the same asset (first in sorted order wins)
+        unique_urls = {}
         for murl in sorted(media_urls):
-            if not murl:
-                continue
-            if murl in downloaded or murl in errors:
-                continue
+            if murl:
+                unique_urls.setdefault(_canon(murl), murl)
+
+        remote_urls = []
+        for murl in unique_urls.values():
 
             # handle data URIs separately
             if murl.startswith("data:"):
@@ -362,71 +514,54 @@ def parse_single_page_and_media(start_url, outfile, media_dir):
                     print(f"[DATA-ERR] {murl[:60]}... -> {err}")
                 continue
 
-            # otherwise, standard URL
-            try:
-                abs_url = urljoin(start_url, murl)
-            except Exception:
-                abs_url = murl
+            remote_urls.append(murl)
 
-            # HEAD request to determine content-type and length (if remote server allows)
-            try:
-                head = sess.head(abs_url, allow_redirects=True, timeout=20)
-                content_type = head.headers.get("content-type", "")
-            except Exception:
-                content_type = None
+        # 3) Download remote media concurrently; the work is network-bound
+        download_slots = asyncio.Semaphore(MAX_DOWNLOAD_WORKERS)
 
-            ext = guess_extension_from_url_or_type(abs_url, content_type) or ""
-            # file base name from URL path, else use hash
-            name_base = os.path.basename(urlparse(abs_url).path) or ""
-            if not name_base or "." not in name_base:
-                # derive from hash
-                h = hashlib.sha256(abs_url.encode("utf-8")).hexdigest()[:16]
-                fname = f"{h}{ext or '.bin'}"
-            else:
-                # sanitize name_base
-                safe_base = re.sub(r'[^A-Za-z0-9._-]', '_', name_base)
-                fname = safe_base
-                if ext and not fname.endswith(ext):
-                    fname = f"{fname}{ext}"
-
-            dest = os.path.join(media_dir, fname)
-
-            # If filename exists, add numeric suffix to avoid overwrite
-            base_noext, extension = os.path.splitext(dest)
-            counter = 1
-            while os.path.exists(dest):
-                dest = f"{base_noext}_{counter}{extension}"
-                counter += 1
-
-            # Download (stream)
-            print(f"Downloading: {abs_url} -> {dest}")
-            ok, err = download_with_requests(sess, abs_url, dest)
-            if ok:
+        async def fetch_bounded(murl):
+            async with download_slots:
+                return await asyncio.to_thread(_fetch_one, sess, start_url, media_dir, murl)
+
+        # gather keeps submission order so the manifest stays sorted and stable between runs
+        fetched = await asyncio.gather(*(fetch_bounded(murl) for murl in remote_urls), return_exceptions=True)
+        for murl, outcome in zip(remote_urls, fetched):
+            if isinstance(outcome, Exception):
+                errors[murl] = str(outcome)
+                continue
+            _, dest, err = outcome
+            if err is None:
                 downloaded[murl] = dest
             else:
                 errors[murl] = err
-                print(f"⚠️ Error downloading {abs_url}: {err}")
 
         # finalize results
         results["media"] = { "downloaded": downloaded, "errors": errors }
 
         # also collect top-level links from page (only first page)
         try:
-            anchors = page.query_selector_all("a[href]")
-            links = sorted(set([urljoin(start_url, a.get_attribute("href")) for a in anchors if a.get_attribute("href")]))
+            hrefs = await page.evaluate(
+                "() => Array.from(document.querySelectorAll('a[href]'), a => a.getAttribute('href')).filter(Boolean)"
+            )
+            links = sorted({urljoin(start_url, href) for href in hrefs})
         except Exception:
             links = []
         results["links"] = links
 
         # write JSON
         os.makedirs(os.path.dirname(outfile) or ".", exist_ok=True)
-        with open(outfile, "w", encoding="utf-8") as f:
-            json.dump(results, f, indent=2, ensure_ascii=False)
+        if orjson:
+            # orjson writes UTF-8 bytes directly, same layout as the stdlib call below
+            payload = orjson.dumps(results, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS)
+        else:
+            payload = json.dumps(results, indent=2, ensure_ascii=False).encode("utf-8")
+        with open(outfile, "wb") as f:
+            f.write(payload)
 
         print(f"\n✅ Done. Output saved to {outfile}")
         print(f"Media saved to: {media_dir} (downloaded: {len(downloaded)}, errors: {len(errors)})")
 
-        browser.close()
+        await browser.close()
 
 
 # -------------------------------
@@ -439,4 +574,4 @@ if __name__ == "__main__":
     parser.add_argument("--media-dir", default="media", help="Directory to save media files")
     args = parser.parse_args()
 
-    parse_single_page_and_media(args.url, args.outfile, args.media_dir)
+    asyncio.run(parse_single_page_and_media(args.url, args.outfile, args.media_dir))